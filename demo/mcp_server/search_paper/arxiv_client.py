@@ -0,0 +1,129 @@
+"""
+Process-wide access to the arXiv API.
+
+All searches go through one ArxivScheduler, which owns:
+
+- a single arxiv.Client whose requests.Session keeps connections alive
+  and is sized for the worker pool
+- a token bucket that spaces out every page request (including retries)
+  to stay within arXiv's budget of one request every 3 seconds
+- single-flight coalescing: concurrent calls for the same normalized
+  query share one fetch instead of each hitting the API
+- a bounded worker pool that runs the blocking paging off the event loop
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+import arxiv
+from requests.adapters import HTTPAdapter
+
+from search_cache import normalize_query
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers that find it empty sleep in FIFO order."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until it is available. Returns the time waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going negative reserves a future token for this caller
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class ScheduledClient(arxiv.Client):
+    """arxiv.Client that takes a token from the bucket before every page request."""
+
+    def __init__(self, bucket: TokenBucket, pool_size: int, page_size: int = 100, num_retries: int = 3):
+        # The bucket replaces the client's own per-instance delay
+        super().__init__(page_size=page_size, delay_seconds=0, num_retries=num_retries)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self.bucket = bucket
+        self.requests = 0
+        self.throttled_seconds = 0.0
+
+    def _parse_feed(self, url: str, first_page: bool = True, _try_index: int = 0):
+        waited = self.bucket.acquire()
+        self.requests += 1
+        self.throttled_seconds += waited
+        return super()._parse_feed(url, first_page=first_page, _try_index=_try_index)
+
+
+class ArxivScheduler:
+    def __init__(self, workers: int = 4, delay_seconds: float = 3.0, burst: int = 1):
+        self.bucket = TokenBucket(rate=1 / delay_seconds, capacity=burst)
+        self.client = ScheduledClient(self.bucket, pool_size=workers)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arxiv")
+        self.searches = 0
+        self.coalesced = 0
+        # (normalized query, max_results) -> future shared by concurrent callers
+        self._inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    def fetch(self, query: str, max_results: int) -> Dict[str, dict]:
+        """
+        Query arXiv (blocking) and return the paper information by paper ID.
+        """
+        # Search for the most relevant articles matching the queried topic
+        search = arxiv.Search(
+            query = query,
+            max_results = max_results,
+            sort_by = arxiv.SortCriterion.Relevance
+        )
+
+        papers_info = {}
+        for paper in self.client.results(search):
+            papers_info[paper.get_short_id()] = {
+                'title': paper.title,
+                'authors': [author.name for author in paper.authors],
+                'summary': paper.summary,
+                'pdf_url': paper.pdf_url,
+                'published': str(paper.published.date())
+            }
+        return papers_info
+
+    async def search(self, query: str, max_results: int) -> Dict[str, dict]:
+        """
+        Fetch a query in the worker pool, joining an identical fetch already in flight.
+        """
+        key = (normalize_query(query), max_results)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return dict(await asyncio.shield(inflight))
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, self.fetch, query, max_results)
+        self._inflight[key] = future
+        self.searches += 1
+        try:
+            return dict(await asyncio.shield(future))
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "searches": self.searches,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "requests": self.client.requests,
+            "throttled_seconds": self.client.throttled_seconds,
+        }
@@ -0,0 +1,134 @@
+"""
+Run a file of chatbot queries without the interactive loop.
+
+Every non-empty line of the input file (lines starting with # are
+comments) is one query, written as in the chat loop:
+
+    What are the latest papers on graph neural networks?
+    @folders
+    @graph_neural_networks
+    /prompt generate_search_prompt topic=diffusion num_papers=5
+
+Queries run through MCP_ChatBot.process_query, --concurrency of them at a
+time, over one set of server sessions (and one result cache). Each result
+is appended to the --output JSONL file as soon as it is done, with its
+latency, LLM requests, token usage and tool calls, so an interrupted sweep
+keeps what it finished. --record / --replay work as for mcp_chatbot.py.
+
+    uv run batch_runner.py queries.txt --output results.jsonl --concurrency 4
+    uv run batch_runner.py queries.txt --deepseek      # with the DeepSeek client
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from cassette import Cassette
+from mcp_chatbot import MCP_ChatBot, prompt_arguments, resource_uri
+from metrics import percentile
+
+
+def read_queries(path: str) -> List[str]:
+    with open(path, "r") as query_file:
+        lines = [line.strip() for line in query_file]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+async def run_query(chatbot: MCP_ChatBot, index: int, query: str, semaphore: asyncio.Semaphore) -> dict:
+    """Answer one query and describe how it went."""
+    async with semaphore:
+        calls = []
+        record = {"index": index, "query": query, "status": "ok"}
+        started = time.perf_counter()
+        try:
+            if query.startswith("@"):
+                record["kind"] = "resource"
+                record["output"] = await chatbot.read_resource_text(resource_uri(query))
+            elif query.startswith("/prompt "):
+                record["kind"] = "prompt"
+                parts = query.split()
+                text = await chatbot.prompt_text(parts[1], prompt_arguments(parts[2:]))
+                record["output"] = await chatbot.process_query(text, echo=False, calls=calls) if text else None
+            elif query.startswith("/"):
+                record["kind"] = "command"
+                raise ValueError(f"Unsupported command in batch mode: {query.split()[0]}")
+            else:
+                record["kind"] = "query"
+                record["output"] = await chatbot.process_query(query, echo=False, calls=calls)
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        record.update(
+            seconds=time.perf_counter() - started,
+            llm_requests=len(calls),
+            ttft_seconds=calls[0]['ttft_seconds'] if calls else None,
+            input_tokens=sum(call['input_tokens'] for call in calls),
+            output_tokens=sum(call['output_tokens'] for call in calls),
+            cache_read_tokens=sum(call['cache_read_tokens'] for call in calls),
+            tool_calls=sum(call['tool_calls'] for call in calls),
+        )
+        return record
+
+
+async def run_batch(chatbot: MCP_ChatBot, queries: List[str], output: str, concurrency: int) -> List[dict]:
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(run_query(chatbot, index, query, semaphore)) for index, query in enumerate(queries)]
+    records = []
+    with open(output, "a") as output_file:
+        for task in asyncio.as_completed(tasks):
+            record = await task
+            output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output_file.flush()
+            records.append(record)
+            print(f"[{len(records)}/{len(queries)}] {record['status']:<5} {record['seconds']:6.2f}s  {record['query'][:60]}")
+    return records
+
+
+def print_summary(records: List[dict], seconds: float):
+    latencies = [record['seconds'] for record in records]
+    errors = sum(record['status'] != "ok" for record in records)
+    print(f"\n{len(records)} queries ({errors} failed) in {seconds:.1f}s, {len(records) / seconds:.2f} queries/s")
+    if latencies:
+        print(f"latency p50 {percentile(latencies, 50):.2f}s  p95 {percentile(latencies, 95):.2f}s  "
+              f"max {max(latencies):.2f}s")
+    print(f"LLM requests {sum(record['llm_requests'] for record in records)}, "
+          f"tool calls {sum(record['tool_calls'] for record in records)}, "
+          f"input tokens {sum(record['input_tokens'] for record in records)} "
+          f"({sum(record['cache_read_tokens'] for record in records)} more from the prompt cache), "
+          f"output tokens {sum(record['output_tokens'] for record in records)}")
+
+
+async def main(chatbot_class=MCP_ChatBot):
+    parser = argparse.ArgumentParser(description="Run a file of chatbot queries and write the results as JSONL")
+    parser.add_argument("queries", help="file with one query, @resource or /prompt command per line")
+    parser.add_argument("--deepseek", action="store_true", help="use the DeepSeek client of mcp_chatbot_deepseek.py")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file the results are appended to")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries running at the same time")
+    parser.add_argument("--max-concurrent-tools", type=int, default=8, help="tool calls running at the same time (all queries)")
+    parser.add_argument("--record", metavar="CASSETTE", help="record LLM and server responses to a cassette file")
+    parser.add_argument("--replay", metavar="CASSETTE", help="replay a cassette instead of contacting the LLM and servers")
+    parser.add_argument("--latency", type=float, help="seconds added to every replayed response")
+    parser.add_argument("--realtime", action="store_true", help="replay with the recorded response times")
+    args = parser.parse_args()
+    if args.deepseek:
+        from mcp_chatbot_deepseek import DeepSeek_ChatBot
+        chatbot_class = DeepSeek_ChatBot
+
+    cassette = None
+    if args.record:
+        cassette = Cassette(args.record, mode="record")
+    elif args.replay:
+        cassette = Cassette(args.replay, mode="playback", latency=args.latency, realtime=args.realtime)
+    queries = read_queries(args.queries)
+    chatbot = chatbot_class(max_concurrent_tools=args.max_concurrent_tools, cassette=cassette)
+    try:
+        await chatbot.connect_to_servers()
+        started = time.perf_counter()
+        records = await run_batch(chatbot, queries, args.output, args.concurrency)
+        print_summary(records, time.perf_counter() - started)
+    finally:
+        await chatbot.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,200 @@
+"""
+Load test for the SSE research server.
+
+Starts sse_server's app in a subprocess (in a throw-away papers directory,
+with arXiv replaced by a mock that sleeps --mock-latency seconds), then
+drives --clients concurrent MCP sessions that each issue --requests mixed
+calls: search_papers, extract_info, and reads of papers://folders and
+papers://{topic}. Prints p50/p95/p99 latency per operation and overall
+throughput, followed by the server's own metrics://server view (of the
+worker that answers it). --workers runs the server as that many worker processes
+behind sse_server's dispatcher.
+
+    uv run benchmark.py --clients 20 --requests 50
+    uv run benchmark.py --clients 20 --requests 50 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+from metrics import percentile
+
+TOPICS = ["graph neural networks", "diffusion models", "reinforcement learning",
+          "large language models", "federated learning", "vision transformers"]
+
+
+def mock_fetch(query: str, max_results: int, latency: float) -> Dict[str, dict]:
+    """Deterministic stand-in for ArxivScheduler.fetch."""
+    time.sleep(latency)
+    prefix = zlib.crc32(query.encode()) % 10000
+    return {
+        f"{prefix:04d}.{i:05d}": {
+            'title': f"{query.title()} paper {i}",
+            'authors': ["Ada Lovelace", "Alan Turing"],
+            'summary': f"A study of {query}. " * 20,
+            'pdf_url': f"https://arxiv.org/pdf/{prefix:04d}.{i:05d}",
+            'published': "2024-01-01"
+        }
+        for i in range(max_results)
+    }
+
+
+def install_mock():
+    """Replace arXiv with mock_fetch in a server process (runs in every worker)."""
+    import server
+    latency = float(os.environ.get("BENCH_MOCK_LATENCY", "0.2"))
+    server.arxiv_scheduler.fetch = lambda query, max_results: mock_fetch(query, max_results, latency)
+    # Keep per-request logging out of the measurements
+    logging.disable(logging.INFO)
+
+
+def serve(port: int, latency: float, workers: int):
+    """Run the SSE server with the mocked arXiv backend (subprocess entry point)."""
+    import sse_server
+    os.environ["BENCH_MOCK_LATENCY"] = str(latency)
+    sse_server.serve(port, workers, setup=install_mock)
+
+
+async def run_client(url: str, requests: int, seed: int, latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+
+    rng = random.Random(seed)
+    async with sse_client(url) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            known_ids = []
+            for _ in range(requests):
+                topic = rng.choice(TOPICS)
+                op = rng.choices(["search_papers", "extract_info", "folders", "topic"], weights=[3, 4, 1, 2])[0]
+                if op == "extract_info" and not known_ids:
+                    op = "search_papers"
+
+                started = time.perf_counter()
+                try:
+                    if op == "search_papers":
+                        result = await session.call_tool("search_papers", {"topic": topic, "max_results": 5})
+                        known_ids.extend(item.text for item in result.content)
+                    elif op == "extract_info":
+                        result = await session.call_tool("extract_info", {"paper_id": rng.choice(known_ids)})
+                    elif op == "folders":
+                        result = await session.read_resource("papers://folders")
+                    else:
+                        result = await session.read_resource(f"papers://{topic.replace(' ', '_')}?mode=summary")
+                    if getattr(result, "isError", False):
+                        raise RuntimeError(result.content)
+                except Exception:
+                    errors[op] = errors.get(op, 0) + 1
+                    continue
+                latencies.setdefault(op, []).append(time.perf_counter() - started)
+
+
+async def read_server_metrics(url: str) -> str:
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+
+    async with sse_client(url) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            result = await session.read_resource("metrics://server")
+            return result.contents[0].text
+
+
+def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server did not start on port {port}")
+
+
+async def benchmark(args) -> dict:
+    url = f"http://127.0.0.1:{args.port}/sse"
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_client(url, args.requests, seed, latencies, errors) for seed in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - started
+
+    report = {"clients": args.clients, "workers": args.workers, "seconds": elapsed, "operations": {}}
+    all_latencies = [value for values in latencies.values() for value in values]
+    for op, values in sorted(latencies.items()) + [("all", all_latencies)]:
+        if not values:
+            continue
+        report["operations"][op] = {
+            "count": len(values),
+            "errors": errors.get(op, 0) if op != "all" else sum(errors.values()),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    report["throughput_rps"] = len(all_latencies) / elapsed
+    report["server_metrics"] = await read_server_metrics(url)
+    return report
+
+
+def print_report(report: dict):
+    print(f"\n{report['clients']} clients, {report['workers']} workers, {report['seconds']:.2f}s, {report['throughput_rps']:.1f} req/s\n")
+    print(f"{'operation':<15}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for op, stats in report["operations"].items():
+        print(f"{op:<15}{stats['count']:>7}{stats['errors']:>8}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    print("\n" + report["server_metrics"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the SSE research server with a mocked arXiv backend")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent MCP sessions")
+    parser.add_argument("--requests", type=int, default=30, help="requests per session")
+    parser.add_argument("--mock-latency", type=float, default=0.2, help="seconds each mocked arXiv search takes")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.mock_latency, args.workers)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server_process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve",
+             "--port", str(args.port), "--mock-latency", str(args.mock_latency),
+             "--workers", str(args.workers)],
+            cwd=workdir,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(args.port)
+            if args.workers > 1:
+                for index in range(args.workers):
+                    wait_for_port(args.port + 1 + index)
+            report = asyncio.run(benchmark(args))
+        finally:
+            server_process.terminate()
+            server_process.wait()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Record and replay the chatbot's LLM and MCP traffic.
+
+A cassette is a JSONL file with one interaction per line:
+
+- LLM requests are captured at the HTTP level with an httpx transport
+  given to the Anthropic client, keyed by the request path and body. The
+  (streamed) response is stored as raw chunks with their time offsets.
+- MCP requests (call_tool, read_resource, get_prompt and the list_*
+  calls) are captured below ServerConnection, keyed by server, method and
+  canonical arguments, with the result and how long the server took.
+
+In record mode every interaction goes to the real endpoint and is
+appended to the file. In playback mode nothing is contacted (no API key,
+network or server process is needed): each request gets the next
+recorded response with the same key, so a recorded session replays
+deterministically. Responses are returned at once, after latency seconds
+if given, or with the recorded timings when realtime is set, which makes
+playback suitable for benchmarking the client loop itself.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+import anthropic
+import httpx
+import mcp.types
+
+from result_cache import canonical_key
+
+
+class CassetteMiss(LookupError):
+    """Playback met a request that was not recorded (or replayed all its recordings)."""
+
+
+def _llm_key(request: httpx.Request) -> str:
+    body = request.content
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    return f"{request.method} {request.url.path} {hashlib.sha256(body).hexdigest()}"
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "playback", latency: Optional[float] = None, realtime: bool = False):
+        """
+        Args:
+            path: Cassette file
+            mode: "record" (append to the file) or "playback"
+            latency: Playback only: seconds added before every response
+            realtime: Playback only: reproduce the recorded timings
+        """
+        if mode not in ("record", "playback"):
+            raise ValueError(f"Unknown cassette mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.realtime = realtime
+        self.replayed = 0
+        self.recorded = 0
+        # key -> recorded interactions not replayed yet, oldest first
+        self._interactions = defaultdict(deque)
+        if self.playback:
+            with open(path, "r") as cassette_file:
+                for line in cassette_file:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self._interactions[interaction["key"]].append(interaction)
+
+    @property
+    def playback(self) -> bool:
+        return self.mode == "playback"
+
+    def _take(self, key: str) -> dict:
+        pending = self._interactions.get(key)
+        if not pending:
+            raise CassetteMiss(f"No recording left in {self.path} for {key}")
+        self.replayed += 1
+        return pending.popleft()
+
+    def _append(self, interaction: dict):
+        with open(self.path, "a") as cassette_file:
+            cassette_file.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+        self.recorded += 1
+
+    async def _delay(self, recorded_seconds: float):
+        delay = (self.latency or 0) + (recorded_seconds if self.realtime else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def client_options(self) -> dict:
+        """Arguments for AsyncAnthropic that route its requests through the cassette."""
+        # Keep the SDK's request timeout so a stalled call fails instead of hanging a recording
+        options = {"http_client": httpx.AsyncClient(transport=_Transport(self), timeout=anthropic.DEFAULT_TIMEOUT)}
+        if self.playback:
+            # Requests never leave the process, but the client insists on a key
+            options["api_key"] = "playback"
+        return options
+
+    def session(self, server: str, session=None) -> "_Session":
+        """Stand-in for a server's ClientSession: the real one when recording, none for playback."""
+        return _Session(self, server, session)
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, chunks: list, first_byte_seconds: float = 0.0):
+        self.cassette = cassette
+        self.chunks = chunks
+        # Chunk offsets count from the request; the transport already waited this long
+        self.first_byte_seconds = first_byte_seconds
+
+    async def __aiter__(self):
+        previous = self.first_byte_seconds
+        for offset, text in self.chunks:
+            if self.cassette.realtime:
+                await asyncio.sleep(offset - previous)
+                previous = offset
+            yield text.encode("latin-1")
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, interaction: dict, stream, started: float):
+        self.cassette = cassette
+        self.interaction = interaction
+        self.stream = stream
+        self.started = started
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            # latin-1 maps every byte to one character, so any body survives JSON
+            self.interaction["chunks"].append([time.perf_counter() - self.started, chunk.decode("latin-1")])
+            yield chunk
+
+    async def aclose(self):
+        await self.stream.aclose()
+        self.cassette._append(self.interaction)
+
+
+class _Transport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self.inner = None if cassette.playback else httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = _llm_key(request)
+        if self.cassette.playback:
+            interaction = self.cassette._take(key)
+            await self.cassette._delay(interaction["first_byte_seconds"])
+            return httpx.Response(
+                interaction["status"], headers=interaction["headers"],
+                stream=_ReplayStream(self.cassette, interaction["chunks"], interaction["first_byte_seconds"])
+            )
+
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        interaction = {
+            "kind": "llm",
+            "key": key,
+            "status": response.status_code,
+            "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in response.headers.raw],
+            "first_byte_seconds": time.perf_counter() - started,
+            "chunks": [],
+        }
+        return httpx.Response(
+            response.status_code, headers=response.headers,
+            stream=_RecordingStream(self.cassette, interaction, response.stream, started)
+        )
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+class _Session:
+    """The ClientSession calls ServerConnection makes, recorded or replayed."""
+
+    def __init__(self, cassette: Cassette, server: str, session=None):
+        self.cassette = cassette
+        self.server = server
+        self.session = session
+
+    async def _call(self, method: str, arguments: dict):
+        key = canonical_key(self.server, method, arguments)
+        if self.cassette.playback:
+            interaction = self.cassette._take(key)
+            await self.cassette._delay(interaction["seconds"])
+            if "error" in interaction:
+                raise RuntimeError(interaction["error"])
+            return getattr(mcp.types, interaction["type"]).model_validate(interaction["result"])
+
+        interaction = {"kind": "mcp", "key": key}
+        started = time.perf_counter()
+        try:
+            result = await getattr(self.session, method)(**arguments)
+        except Exception as e:
+            interaction.update(seconds=time.perf_counter() - started, error=str(e))
+            self.cassette._append(interaction)
+            raise
+        interaction.update(
+            seconds=time.perf_counter() - started,
+            type=type(result).__name__,
+            result=result.model_dump(mode="json", by_alias=True, exclude_none=True),
+        )
+        self.cassette._append(interaction)
+        return result
+
+    async def call_tool(self, name, arguments=None):
+        return await self._call("call_tool", {"name": name, "arguments": arguments})
+
+    async def read_resource(self, uri):
+        return await self._call("read_resource", {"uri": str(uri)})
+
+    async def get_prompt(self, name, arguments=None):
+        return await self._call("get_prompt", {"name": name, "arguments": arguments})
+
+    async def list_tools(self):
+        return await self._call("list_tools", {})
+
+    async def list_prompts(self):
+        return await self._call("list_prompts", {})
+
+    async def list_resources(self):
+        return await self._call("list_resources", {})
@@ -0,0 +1,99 @@
+"""
+Token-budgeted message history for the chatbot.
+
+Every tool round of a query appends the assistant's tool_use message and a
+user message with the tool results, and the whole list is resent on each
+request. ChatHistory keeps the full messages but builds what is sent from
+them so that it stays within a token budget:
+
+1. tool results older than the last keep_rounds rounds are cut down to
+   max_result_chars, keeping their beginning and a note of what was cut
+2. if that is still over budget, the oldest rounds (a tool_use message and
+   its tool_result message, always together so every tool_use keeps its
+   result) are dropped, and a note in the next round says how many
+
+The first message (the query) and the latest round are always sent.
+Tokens are estimated locally from the serialized size, without an API call.
+"""
+import json
+from typing import List
+
+# Rough size of a token in characters of serialized JSON
+CHARS_PER_TOKEN = 4
+
+
+def _plain(value):
+    """JSON-compatible form of SDK content blocks (pydantic models)."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def serialized_size(value) -> int:
+    """Size in bytes of a request payload (messages, tools, ...) as JSON."""
+    return len(json.dumps(value, default=_plain, ensure_ascii=False).encode())
+
+
+def estimate_tokens(value) -> int:
+    return len(json.dumps(value, default=_plain, ensure_ascii=False)) // CHARS_PER_TOKEN + 1
+
+
+def _truncate_result(block: dict, max_chars: int) -> dict:
+    """Copy of a tool_result block whose text is cut to max_chars."""
+    content = block.get("content")
+    if isinstance(content, str):
+        text = content
+    else:
+        text = "\n".join(part.get("text", "") for part in content or [])
+    if len(text) <= max_chars:
+        return block
+    note = f"\n[... {len(text) - max_chars} more characters of this older tool result omitted]"
+    return {**block, "content": [{"type": "text", "text": text[:max_chars] + note}]}
+
+
+class ChatHistory:
+    def __init__(self, token_budget: int = 20000, keep_rounds: int = 2, max_result_chars: int = 2000):
+        """
+        Args:
+            token_budget: Estimated tokens the sent messages may take
+            keep_rounds: Latest tool rounds whose results are sent in full
+            max_result_chars: Characters kept of each older tool result
+        """
+        self.token_budget = token_budget
+        self.keep_rounds = keep_rounds
+        self.max_result_chars = max_result_chars
+        self.messages: List[dict] = []
+
+    def append(self, role: str, content):
+        self.messages.append({'role': role, 'content': content})
+
+    def window(self) -> List[dict]:
+        """Messages to send with the next request."""
+        if len(self.messages) <= 1:
+            return list(self.messages)
+        head, rest = self.messages[0], self.messages[1:]
+        # rest alternates assistant (tool_use) and user (tool_result) messages,
+        # possibly ending with an assistant message without a result yet
+        rounds = [rest[index:index + 2] for index in range(0, len(rest), 2)]
+
+        for index in range(max(len(rounds) - self.keep_rounds, 0)):
+            assistant, *results = rounds[index]
+            if results and isinstance(results[0]['content'], list):
+                content = [
+                    _truncate_result(block, self.max_result_chars)
+                    if isinstance(block, dict) and block.get("type") == "tool_result" else block
+                    for block in results[0]['content']
+                ]
+                rounds[index] = [assistant, {**results[0], 'content': content}]
+
+        sizes = [estimate_tokens(messages) for messages in rounds]
+        total = estimate_tokens(head) + sum(sizes)
+        dropped = 0
+        while total > self.token_budget and dropped < len(rounds) - 1:
+            total -= sizes[dropped]
+            dropped += 1
+        kept = [message for messages in rounds[dropped:] for message in messages]
+        if dropped and len(kept) > 1:
+            note = {"type": "text", "text": f"[{dropped} earlier tool round(s) omitted to save context]"}
+            kept[1] = {**kept[1], 'content': list(kept[1]['content']) + [note]}
+        return [head] + kept
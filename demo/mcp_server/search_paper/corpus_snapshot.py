@@ -0,0 +1,304 @@
+"""
+Compact columnar snapshot of the paper corpus.
+
+A snapshot (papers/corpus.snap by default) holds every stored paper in a
+single file that is memory-mapped rather than parsed:
+
+- one string table: each distinct string (author names, topics, dates,
+  titles, ...) is stored once as UTF-8 and referenced by index
+- one uint32 column per field (id, title, summary, pdf url, published) with
+  string indexes, rows sorted by paper id so lookups are a binary search
+- authors as a flat column of string indexes plus per-paper start offsets
+- per topic, the state of its log (generation, size, superseded records)
+  and its members with their log offsets, so PaperStore can adopt the
+  index instead of re-parsing the logs and only scan what was appended
+  after the snapshot
+
+Numbers are stored in the machine's byte order; a marker in the header
+rejects snapshots written on a machine with the other one.
+
+    uv run corpus_snapshot.py export              # papers/ -> papers/corpus.snap
+    uv run corpus_snapshot.py import other.snap   # add another corpus to papers/
+    uv run corpus_snapshot.py info
+"""
+import array
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+SNAPSHOT_NAME = "corpus.snap"
+
+MAGIC = b"PAPERSNP"
+VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+
+# Sections in file order, with their array typecode ('B' for raw bytes)
+SECTIONS = (
+    ("string_offsets", "Q"),
+    ("string_data", "B"),
+    ("paper_id", "I"),
+    ("paper_title", "I"),
+    ("paper_summary", "I"),
+    ("paper_pdf_url", "I"),
+    ("paper_published", "I"),
+    ("paper_topic", "I"),
+    ("paper_offset", "Q"),
+    ("author_offsets", "I"),
+    ("authors", "I"),
+    ("topic_name", "I"),
+    ("topic_generation", "Q"),
+    ("topic_size", "Q"),
+    ("topic_dead", "I"),
+    ("topic_updated", "d"),
+    ("member_offsets", "I"),
+    ("member_paper", "I"),
+    ("member_offset", "Q"),
+    ("member_crc", "I"),
+)
+_HEADER = struct.Struct("=8sII")
+_SECTION = struct.Struct("=QQ")
+
+
+class TopicState:
+    """Log state and members (paper id, log offset, record crc) of one topic."""
+
+    def __init__(self, name: str, generation: int, size: int, dead: int, updated: float,
+                 members: List[Tuple[str, int, int]]):
+        self.name = name
+        self.generation = generation
+        self.size = size
+        self.dead = dead
+        self.updated = updated
+        self.members = members
+
+
+def write_snapshot(path: str, papers: Iterable[Tuple[str, dict, str, int]], topics: List[TopicState]) -> int:
+    """
+    Write a snapshot atomically.
+
+    Args:
+        path: File to write
+        papers: (paper id, paper information, topic, log offset) of the
+            record each paper id resolves to
+        topics: State of every topic log
+
+    Returns:
+        Number of bytes written
+    """
+    strings: Dict[str, int] = {}
+    string_offsets = array.array("Q", [0])
+    string_data = bytearray()
+
+    def intern(text: str) -> int:
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+            string_data.extend(text.encode())
+            string_offsets.append(len(string_data))
+        return index
+
+    topic_index = {topic.name: index for index, topic in enumerate(topics)}
+    columns = {name: array.array(typecode) for name, typecode in SECTIONS if typecode != "B"}
+    columns["author_offsets"].append(0)
+    rows: Dict[str, int] = {}
+    for paper_id, paper_info, topic, offset in sorted(papers, key=lambda paper: paper[0]):
+        rows[paper_id] = len(rows)
+        columns["paper_id"].append(intern(paper_id))
+        columns["paper_title"].append(intern(paper_info.get("title", "")))
+        columns["paper_summary"].append(intern(paper_info.get("summary", "")))
+        columns["paper_pdf_url"].append(intern(paper_info.get("pdf_url", "")))
+        columns["paper_published"].append(intern(paper_info.get("published", "")))
+        columns["paper_topic"].append(topic_index[topic])
+        columns["paper_offset"].append(offset)
+        columns["authors"].extend(intern(author) for author in paper_info.get("authors", []))
+        columns["author_offsets"].append(len(columns["authors"]))
+
+    columns["member_offsets"].append(0)
+    for topic in topics:
+        columns["topic_name"].append(intern(topic.name))
+        columns["topic_generation"].append(topic.generation)
+        columns["topic_size"].append(topic.size)
+        columns["topic_dead"].append(topic.dead)
+        columns["topic_updated"].append(topic.updated)
+        for paper_id, offset, crc in topic.members:
+            columns["member_paper"].append(rows[paper_id])
+            columns["member_offset"].append(offset)
+            columns["member_crc"].append(crc)
+        columns["member_offsets"].append(len(columns["member_paper"]))
+    columns["string_offsets"] = string_offsets
+
+    # Every section starts on an 8-byte boundary so it can be cast in place
+    position = _HEADER.size + _SECTION.size * len(SECTIONS)
+    table, blobs = [], []
+    for name, _ in SECTIONS:
+        blob = bytes(string_data) if name == "string_data" else columns[name].tobytes()
+        position += -position % 8
+        table.append(_SECTION.pack(position, len(blob)))
+        blobs.append((position, blob))
+        position += len(blob)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as snapshot_file:
+        snapshot_file.write(_HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK))
+        snapshot_file.write(b"".join(table))
+        for offset, blob in blobs:
+            snapshot_file.write(b"\0" * (offset - snapshot_file.tell()))
+            snapshot_file.write(blob)
+        size = snapshot_file.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as snapshot_file:
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byte_order = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION or byte_order != BYTE_ORDER_MARK:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} paper snapshot for this machine")
+        self._view = view = memoryview(self._mmap)
+        self._columns: Dict[str, memoryview] = {}
+        for index, (name, typecode) in enumerate(SECTIONS):
+            offset, length = _SECTION.unpack_from(self._mmap, _HEADER.size + _SECTION.size * index)
+            self._columns[name] = view[offset:offset + length].cast(typecode)
+        self._string_offsets = self._columns["string_offsets"]
+        self._data_start = _SECTION.unpack_from(self._mmap, _HEADER.size + _SECTION.size)[0]
+
+    def __len__(self) -> int:
+        return len(self._columns["paper_id"])
+
+    def close(self):
+        for column in self._columns.values():
+            column.release()
+        self._view.release()
+        self._mmap.close()
+
+    def string(self, index: int) -> str:
+        start = self._data_start + self._string_offsets[index]
+        return self._mmap[start:self._data_start + self._string_offsets[index + 1]].decode()
+
+    def paper_id(self, row: int) -> str:
+        return self.string(self._columns["paper_id"][row])
+
+    def find(self, paper_id: str) -> Optional[int]:
+        """Row of a paper id, or None."""
+        ids = self._columns["paper_id"]
+        low, high = 0, len(ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(ids[middle]) < paper_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(ids) and self.string(ids[low]) == paper_id else None
+
+    def paper(self, row: int) -> dict:
+        """Paper information of a row, in the same shape PaperStore returns."""
+        columns = self._columns
+        authors = columns["authors"][columns["author_offsets"][row]:columns["author_offsets"][row + 1]]
+        return {
+            'title': self.string(columns["paper_title"][row]),
+            'authors': [self.string(author) for author in authors],
+            'summary': self.string(columns["paper_summary"][row]),
+            'pdf_url': self.string(columns["paper_pdf_url"][row]),
+            'published': self.string(columns["paper_published"][row]),
+        }
+
+    def location(self, row: int) -> Tuple[str, int, int]:
+        """(topic, topic log generation, log offset) of the record a row was taken from."""
+        topic = self._columns["paper_topic"][row]
+        return (
+            self.string(self._columns["topic_name"][topic]),
+            self._columns["topic_generation"][topic],
+            self._columns["paper_offset"][row],
+        )
+
+    def iter_papers(self) -> Iterator[Tuple[str, dict]]:
+        for row in range(len(self)):
+            yield self.paper_id(row), self.paper(row)
+
+    def column(self, field: str) -> List[str]:
+        """Decode one field (title, summary, pdf_url, published) of every paper."""
+        return [self.string(index) for index in self._columns[f"paper_{field}"]]
+
+    def topics(self) -> List[TopicState]:
+        columns = self._columns
+        member_offsets = columns["member_offsets"]
+        states = []
+        for index in range(len(columns["topic_name"])):
+            start, stop = member_offsets[index], member_offsets[index + 1]
+            states.append(TopicState(
+                name=self.string(columns["topic_name"][index]),
+                generation=columns["topic_generation"][index],
+                size=columns["topic_size"][index],
+                dead=columns["topic_dead"][index],
+                updated=columns["topic_updated"][index],
+                members=[
+                    (self.paper_id(columns["member_paper"][member]),
+                     columns["member_offset"][member],
+                     columns["member_crc"][member])
+                    for member in range(start, stop)
+                ],
+            ))
+        return states
+
+
+def import_snapshot(snapshot: Snapshot, store) -> int:
+    """
+    Add every topic of a snapshot to a PaperStore.
+
+    Members are written with the version of the paper the snapshot
+    resolved its id to.
+
+    Returns:
+        Number of papers in the snapshot
+    """
+    papers_by_topic = {}
+    for topic in snapshot.topics():
+        papers_by_topic[topic.name] = {
+            paper_id: snapshot.paper(snapshot.find(paper_id)) for paper_id, _, _ in topic.members
+        }
+    store.add_batch(papers_by_topic)
+    return len(snapshot)
+
+
+def main(argv: List[str]):
+    from paper_store import PaperStore
+
+    usage = "usage: corpus_snapshot.py export [papers_dir] [snapshot] | import <snapshot> [papers_dir] | info [snapshot]"
+    if not argv or argv[0] not in ("export", "import", "info"):
+        print(usage)
+        return 2
+
+    if argv[0] == "export":
+        root = argv[1] if len(argv) > 1 else "papers"
+        path = argv[2] if len(argv) > 2 else os.path.join(root, SNAPSHOT_NAME)
+        store = PaperStore(root)
+        size = store.export_snapshot(path)
+        print(f"Wrote {store.stats()['papers']} papers to {path} ({size / 1e6:.1f} MB)")
+    elif argv[0] == "import":
+        if len(argv) < 2:
+            print(usage)
+            return 2
+        root = argv[2] if len(argv) > 2 else "papers"
+        snapshot = Snapshot(argv[1])
+        count = import_snapshot(snapshot, PaperStore(root))
+        snapshot.close()
+        print(f"Imported {count} papers from {argv[1]} into {root}")
+    else:
+        path = argv[1] if len(argv) > 1 else os.path.join("papers", SNAPSHOT_NAME)
+        snapshot = Snapshot(path)
+        topics = snapshot.topics()
+        print(f"{path}: {len(snapshot)} papers, {len(topics)} topics, {os.path.getsize(path) / 1e6:.1f} MB")
+        for topic in topics:
+            print(f"- {topic.name}: {len(topic.members)} papers (log generation {topic.generation}, {topic.size} bytes)")
+        snapshot.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,131 +1,625 @@
 from dotenv import load_dotenv
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
-from contextlib import AsyncExitStack
+from chat_history import ChatHistory, estimate_tokens, serialized_size
+from result_cache import ResultCache, canonical_key
+from cassette import Cassette
+import argparse
+import contextlib
+import hashlib
 import json
+import os
 import asyncio
-import nest_asyncio
-
-nest_asyncio.apply()
+import time
 
 load_dotenv()
 
+
+def capability_key(server_config):
+    """Cache key of a server: its command line, env and the mtime of every local file it names."""
+    command = [server_config.get("command", "")] + list(server_config.get("args", []))
+    stamps = [os.path.getmtime(part) for part in command if os.path.isfile(part)]
+    return hashlib.sha256(json.dumps([command, server_config.get("env"), stamps]).encode()).hexdigest()[:16]
+
+
+def resource_uri(query):
+    """Resource URI of an @folders / @<topic> query."""
+    # Remove @ sign
+    topic = query[1:]
+    if topic == "folders":
+        return "papers://folders"
+    return f"papers://{topic}"
+
+
+def prompt_arguments(parts):
+    """Parse the arg1=value1 arg2=value2 words of a /prompt command."""
+    args = {}
+    for arg in parts:
+        if '=' in arg:
+            key, value = arg.split('=', 1)
+            args[key] = value
+    return args
+
+
+class StartCancelled(ConnectionError):
+    """The request that was starting a server was cancelled before it connected."""
+
+
+class ServerConnection:
+    """
+    One configured MCP server, connected on first use.
+    
+    Offers the ClientSession calls the chatbot makes (call_tool,
+    read_resource, get_prompt), so it can stand in for a session in the
+    routing table before the server process even exists. The stdio client
+    and the session are entered and exited in one long-lived task (anyio
+    requires it), which also lets servers start concurrently.
+    
+    With an idle_timeout the server process is stopped once no request has
+    used it for that many seconds, and started again by the next one.
+    
+    With a result cache and a cache config naming the idempotent tools and
+    resource URIs ({name: {"ttl": seconds, "skip": [text prefixes]}}),
+    their successful results are reused within the TTL without asking the
+    server (or starting it). Nothing else is cached, and neither are results
+    starting with a "skip" prefix (such as a "not found" reply).
+    
+    With a cassette, requests are recorded, or replayed without starting
+    the server at all.
+    """
+
+    def __init__(self, name, server_params, timeout, idle_timeout=None, cache=None, cache_config=None,
+                 cassette=None):
+        self.name = name
+        self.cassette = cassette
+        self.server_params = server_params
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.cache = cache
+        self.cache_config = cache_config or {}
+        # Called (in the background) with this connection once it has connected
+        self.on_connect = None
+        self.connect_seconds = None
+        self.server_version = None
+        # Times the server process was started, requests sent to it
+        self.starts = 0
+        self.requests = 0
+        self._ready = None
+        self._close_event = None
+        self._in_flight = 0
+        self._idle_handle = None
+        # Server tasks (including ones still shutting down) and on_connect callbacks
+        self._background = set()
+
+    @property
+    def connected(self):
+        return self._ready is not None and self._ready.done() and not self._ready.exception()
+
+    async def _run(self, ready, close_event):
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    init_result = await session.initialize()
+                    self.server_version = f"{init_result.serverInfo.name} {init_result.serverInfo.version}"
+                    if not ready.done():
+                        ready.set_result(session)
+                    await close_event.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"Server {self.name} stopped: {e}")
+        finally:
+            # The next use starts the server again
+            if self._ready is ready:
+                self._ready = None
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def session(self):
+        """Return the server's session, starting the server if it is not running."""
+        while self._ready is not None:
+            try:
+                return await asyncio.shield(self._ready)
+            except StartCancelled:
+                # Whoever was starting it gave up; start it for this request
+                pass
+        
+        started = time.perf_counter()
+        self._ready = ready = asyncio.get_running_loop().create_future()
+        self._close_event = asyncio.Event()
+        task = self._spawn(self._run(ready, self._close_event))
+        self.starts += 1
+        try:
+            session = await asyncio.wait_for(asyncio.shield(ready), self.timeout)
+        except asyncio.TimeoutError:
+            if not ready.done():
+                ready.set_exception(TimeoutError(f"Server {self.name} did not start within {self.timeout}s"))
+            task.cancel()
+            self._ready = None
+            raise ready.exception()
+        except BaseException:
+            # Release the requests waiting for the same start
+            if not ready.done():
+                ready.set_exception(StartCancelled(f"Starting server {self.name} was cancelled"))
+                ready.exception()
+            task.cancel()
+            self._ready = None
+            raise
+        self.connect_seconds = time.perf_counter() - started
+        
+        if self.on_connect is not None:
+            self._spawn(self.on_connect(self))
+        return session
+
+    @contextlib.asynccontextmanager
+    async def _request(self):
+        """Session for one request; the idle timer only runs while no request is in flight."""
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        self._in_flight += 1
+        self.requests += 1
+        try:
+            if self.cassette is not None and self.cassette.playback:
+                yield self.cassette.session(self.name)
+            else:
+                session = await self.session()
+                yield session if self.cassette is None else self.cassette.session(self.name, session)
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight and self.idle_timeout is not None and self._ready is not None:
+                self._idle_handle = asyncio.get_running_loop().call_later(self.idle_timeout, self.stop)
+
+    def stop(self):
+        """Stop the server process; the next request starts it again."""
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        if self._in_flight or self._ready is None:
+            return
+        # Forget the session now so that a request arriving while the old
+        # process shuts down starts a new one instead of using it
+        self._ready = None
+        self._close_event.set()
+
+    def cache_ttl(self, name):
+        """Seconds results of a tool or resource are reused (0: not cached)."""
+        if self.cache is None:
+            return 0
+        return self.cache_config.get(name, {}).get("ttl", 0)
+
+    def cacheable(self, name, result):
+        """Whether a result may be reused: not an error, and not one of the tool's "skip" replies."""
+        if getattr(result, "isError", False):
+            return False
+        contents = getattr(result, "content", None) or getattr(result, "contents", None) or []
+        text = getattr(contents[0], "text", "") if contents else ""
+        return not any(text.startswith(prefix) for prefix in self.cache_config.get(name, {}).get("skip", []))
+
+    async def _memoized(self, name, arguments, call):
+        ttl = self.cache_ttl(name)
+        if not ttl:
+            return await call()
+        key = canonical_key(self.name, name, arguments)
+        result = self.cache.get(key)
+        if result is None:
+            result = await call()
+            if self.cacheable(name, result):
+                self.cache.put(key, result, ttl)
+        return result
+
+    async def call_tool(self, name, arguments=None):
+        async def call():
+            async with self._request() as session:
+                return await session.call_tool(name, arguments=arguments)
+        return await self._memoized(name, arguments, call)
+
+    async def read_resource(self, uri):
+        async def read():
+            async with self._request() as session:
+                return await session.read_resource(uri)
+        return await self._memoized(str(uri), None, read)
+
+    async def get_prompt(self, name, arguments=None):
+        async with self._request() as session:
+            return await session.get_prompt(name, arguments=arguments)
+
+    async def list_capabilities(self):
+        """
+        List the server's tools, prompts and resources as plain data.
+        
+        Returns:
+            {"tools": [...], "prompts": [...], "resources": [uri, ...]}
+        
+        Raises:
+            TimeoutError: Starting the server and listing took longer than its timeout
+        """
+        started = time.perf_counter()
+        async with self._request() as session:
+            # The server's timeout covers starting it and listing
+            remaining = self.timeout - (time.perf_counter() - started)
+            try:
+                listings = await asyncio.wait_for(asyncio.gather(
+                    session.list_tools(), session.list_prompts(), session.list_resources(),
+                    return_exceptions=True
+                ), max(remaining, 0))
+            except asyncio.TimeoutError:
+                listings = None
+        if listings is None:
+            # Do not keep a server that hangs around
+            self.stop()
+            raise TimeoutError(f"Server {self.name} did not list its capabilities within {self.timeout}s")
+        # A server without prompts or resources may reject those requests
+        for listing in listings:
+            if isinstance(listing, Exception):
+                print(f"Error {listing}")
+        tools_response, prompts_response, resources_response = (
+            None if isinstance(listing, Exception) else listing for listing in listings
+        )
+        return {
+            "tools": [
+                {"name": tool.name, "description": tool.description, "input_schema": tool.inputSchema}
+                for tool in (tools_response.tools if tools_response else [])
+            ],
+            "prompts": [
+                {
+                    "name": prompt.name,
+                    "description": prompt.description,
+                    "arguments": [arg.model_dump(exclude_none=True) for arg in prompt.arguments or []]
+                }
+                for prompt in (prompts_response.prompts if prompts_response else [])
+            ],
+            "resources": [
+                str(resource.uri) for resource in (resources_response.resources if resources_response else [])
+            ],
+        }
+
+    async def close(self):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        if self._close_event is not None:
+            self._close_event.set()
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+
 class MCP_ChatBot:
-    def __init__(self):
-        self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+    MODEL = 'claude-3-7-sonnet-20250219'
+    # Optional system prompt, sent (and cached) before every request
+    SYSTEM_PROMPT = None
+
+    def __init__(self, tool_timeout=60.0, max_concurrent_tools=4, server_timeout=30.0,
+                 capability_cache="capability_cache.json", idle_timeout=None, history_token_budget=20000,
+                 result_cache_size=256, prompt_caching=True, cassette=None):
+        # Cassette recording or replaying LLM and server responses (see cassette.py)
+        self.cassette = cassette
+        self.anthropic = self.create_client()
+        # Mark the tool definitions and system prompt, which are the same on
+        # every request, for provider-side prompt caching
+        self.prompt_caching = prompt_caching
+        # Tool results and resource reads of servers with a "cache" config,
+        # shared by all queries
+        self.result_cache = ResultCache(max_entries=result_cache_size)
+        # Estimated tokens of messages resent to the model on each tool round
+        self.history_token_budget = history_token_budget
+        # Seconds a server may take to start and list its capabilities
+        # (override per server with "timeout" in server_config.json)
+        self.server_timeout = server_timeout
+        # Lazy mode: seconds after which an unused server process is stopped
+        # (override per server with "idle_timeout"; None keeps servers running)
+        self.idle_timeout = idle_timeout
+        # Server name -> ServerConnection, in config order
+        self.connections = {}
+        # Server name -> its tools, prompts and resources
+        self.capabilities = {}
+        # Capabilities of every server seen before, so startup need not wait
+        # for them (None disables the cache)
+        self.capability_cache = capability_cache
+        # Startup status and timing of every server
+        self.startup_report = []
+        # Seconds a single tool call may take before the model gets an error instead
+        self.tool_timeout = tool_timeout
+        # Tool calls of one response run concurrently, at most this many at once
+        self.tool_semaphore = asyncio.Semaphore(max_concurrent_tools)
+        # Timing and token usage of every LLM request, see /stats
+        self.llm_calls = []
         # Tools list required for Anthropic API
         self.available_tools = []
         # Prompts list for quick display 
         self.available_prompts = []
-        # Sessions dict maps tool/prompt names or resource URIs to MCP client sessions
+        # Sessions dict maps tool/prompt names or resource URIs to the
+        # ServerConnection that serves them
         self.sessions = {}
 
-    async def connect_to_server(self, server_name, server_config):
+    def create_client(self):
+        return AsyncAnthropic(**self.client_options())
+
+    def client_options(self):
+        """Extra AsyncAnthropic arguments: the cassette's HTTP client when recording or replaying."""
+        if self.cassette is None:
+            return {}
+        return self.cassette.client_options()
+
+    def request_prefix(self):
+        """
+        Tools and system prompt of a request.
+        
+        With prompt caching the last tool definition (and the system prompt)
+        carries a cache breakpoint, so the provider caches everything up to
+        it and later requests read the tool schemas from the cache.
+        """
+        tools = list(self.available_tools)
+        system = [{"type": "text", "text": self.SYSTEM_PROMPT}] if self.SYSTEM_PROMPT else []
+        if self.prompt_caching:
+            if tools:
+                tools[-1] = {**tools[-1], "cache_control": {"type": "ephemeral"}}
+            if system:
+                system[-1]["cache_control"] = {"type": "ephemeral"}
+        prefix = {"tools": tools}
+        if system:
+            prefix["system"] = system
+        return prefix
+
+    def create_history(self):
+        """Message history of one query, see chat_history.py for the token budget."""
+        return ChatHistory(token_budget=self.history_token_budget)
+
+    def load_capability_cache(self):
+        if not self.capability_cache:
+            return {}
         try:
-            server_params = StdioServerParameters(**server_config)
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            read, write = stdio_transport
-            session = await self.exit_stack.enter_async_context(
-                ClientSession(read, write)
-            )
-            await session.initialize()
-            
-            
-            try:
-                # List available tools
-                response = await session.list_tools()
-                for tool in response.tools:
-                    self.sessions[tool.name] = session
-                    self.available_tools.append({
-                        "name": tool.name,
-                        "description": tool.description,
-                        "input_schema": tool.inputSchema
-                    })
-            
-                # List available prompts
-                prompts_response = await session.list_prompts()
-                if prompts_response and prompts_response.prompts:
-                    for prompt in prompts_response.prompts:
-                        self.sessions[prompt.name] = session
-                        self.available_prompts.append({
-                            "name": prompt.name,
-                            "description": prompt.description,
-                            "arguments": prompt.arguments
-                        })
-                # List available resources
-                resources_response = await session.list_resources()
-                if resources_response and resources_response.resources:
-                    for resource in resources_response.resources:
-                        resource_uri = str(resource.uri)
-                        self.sessions[resource_uri] = session
-            
-            except Exception as e:
-                print(f"Error {e}")
-                
+            with open(self.capability_cache, "r") as cache_file:
+                return json.load(cache_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_capability_cache(self):
+        # With a cassette the capabilities come from (or go to) the cassette instead
+        if not self.capability_cache or self.cassette is not None:
+            return
+        cache = self.load_capability_cache()
+        for server_name, connection in self.connections.items():
+            if server_name in self.capabilities and connection.connected:
+                cache[connection.cache_key] = {
+                    "server": server_name,
+                    "version": connection.server_version,
+                    "capabilities": self.capabilities[server_name],
+                }
+        tmp_path = f"{self.capability_cache}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump(cache, cache_file, indent=2)
+        os.replace(tmp_path, self.capability_cache)
+
+    async def connect_to_server(self, connection, cached):
+        """
+        Get a server's tools, prompts and resources, from the cache if possible.
+        
+        Returns:
+            (capabilities or None if the server failed to start, timing)
+        """
+        timing = {"server": connection.name, "status": "ok", "connect_seconds": None, "list_seconds": None}
+        if cached is not None:
+            # Revalidate once the server is started for its first tool call
+            connection.on_connect = self.revalidate
+            timing["status"] = "cached"
+            return cached["capabilities"], timing
+        
+        started = time.perf_counter()
+        try:
+            capabilities = await connection.list_capabilities()
         except Exception as e:
-            print(f"Error connecting to {server_name}: {e}")
+            timing["status"] = "timeout" if isinstance(e, TimeoutError) else "error"
+            print(f"Error connecting to {connection.name}: {e}")
+            return None, timing
+        timing["connect_seconds"] = connection.connect_seconds
+        timing["list_seconds"] = time.perf_counter() - started - (connection.connect_seconds or 0)
+        return capabilities, timing
+
+    async def revalidate(self, connection):
+        """Compare a server's cached capabilities with what it reports now."""
+        connection.on_connect = None
+        try:
+            capabilities = await connection.list_capabilities()
+        except Exception as e:
+            print(f"Error revalidating {connection.name}: {e}")
+            return
+        if capabilities != self.capabilities.get(connection.name):
+            print(f"\nServer {connection.name} ({connection.server_version}) changed its capabilities; updated.")
+            self.capabilities[connection.name] = capabilities
+            self.rebuild_routes()
+        self.save_capability_cache()
+
+    def rebuild_routes(self):
+        """Route every tool, prompt and resource to its server, in config order."""
+        self.available_tools = []
+        self.available_prompts = []
+        self.sessions = {}
+        for server_name, connection in self.connections.items():
+            capabilities = self.capabilities.get(server_name)
+            if capabilities is None:
+                continue
+            for tool in capabilities["tools"]:
+                self.sessions[tool["name"]] = connection
+                self.available_tools.append(tool)
+            for prompt in capabilities["prompts"]:
+                self.sessions[prompt["name"]] = connection
+                self.available_prompts.append(prompt)
+            for resource_uri in capabilities["resources"]:
+                self.sessions[resource_uri] = connection
 
     async def connect_to_servers(self):
         try:
             with open("server_config.json", "r") as file:
                 data = json.load(file)
             servers = data.get("mcpServers", {})
-            for server_name, server_config in servers.items():
-                await self.connect_to_server(server_name, server_config)
         except Exception as e:
             print(f"Error loading server config: {e}")
             raise
+        
+        # With a cassette the capabilities are recorded and replayed like everything else
+        cache = self.load_capability_cache() if self.cassette is None else {}
+        cached = {}
+        for server_name, server_config in servers.items():
+            server_config = dict(server_config)
+            timeout = server_config.pop("timeout", self.server_timeout)
+            idle_timeout = server_config.pop("idle_timeout", self.idle_timeout)
+            cache_config = server_config.pop("cache", None)
+            connection = ServerConnection(
+                server_name, StdioServerParameters(**server_config), timeout, idle_timeout,
+                cache=self.result_cache, cache_config=cache_config, cassette=self.cassette
+            )
+            connection.cache_key = capability_key(server_config)
+            self.connections[server_name] = connection
+            cached[server_name] = cache.get(connection.cache_key)
+        
+        # Start every uncached server at once; startup takes as long as the slowest one
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            self.connect_to_server(connection, cached[server_name])
+            for server_name, connection in self.connections.items()
+        ))
+        
+        for (capabilities, timing), server_name in zip(results, self.connections):
+            if capabilities is not None:
+                self.capabilities[server_name] = capabilities
+                timing["tools"] = len(capabilities["tools"])
+            self.startup_report.append(timing)
+        self.rebuild_routes()
+        self.save_capability_cache()
+        for connection in self.connections.values():
+            # In lazy mode servers only run while they are needed
+            if connection.idle_timeout is not None:
+                connection.stop()
+        self.print_startup_report(time.perf_counter() - started)
+    
+    def print_startup_report(self, seconds):
+        print(f"\n{'server':<16}{'status':<9}{'connect s':>10}{'list s':>8}{'tools':>7}")
+        for timing in self.startup_report:
+            connect = f"{timing['connect_seconds']:.2f}" if timing['connect_seconds'] is not None else "-"
+            listing = f"{timing['list_seconds']:.2f}" if timing['list_seconds'] is not None else "-"
+            print(f"{timing['server']:<16}{timing['status']:<9}{connect:>10}{listing:>8}{timing.get('tools', 0):>7}")
+        print(f"Connected to servers in {seconds:.2f}s")
     
-    async def process_query(self, query):
-        messages = [{'role':'user', 'content':query}]
+    async def call_tool(self, tool_use):
+        """
+        Call the tool a tool_use block asks for and build its tool_result.
+        
+        Failures (unknown tool, timeout, server error) are reported to the
+        model as an error result instead of aborting the other calls.
+        """
+        result_block = {"type": "tool_result", "tool_use_id": tool_use.id}
+        
+        # Get session and call tool
+        session = self.sessions.get(tool_use.name)
+        if not session:
+            print(f"Tool '{tool_use.name}' not found.")
+            return {**result_block, "content": f"Tool '{tool_use.name}' not found.", "is_error": True}
+        
+        async with self.tool_semaphore:
+            try:
+                result = await asyncio.wait_for(
+                    session.call_tool(tool_use.name, arguments=tool_use.input),
+                    timeout=self.tool_timeout
+                )
+            except asyncio.TimeoutError:
+                print(f"Tool '{tool_use.name}' timed out after {self.tool_timeout}s.")
+                return {**result_block, "content": f"Tool call timed out after {self.tool_timeout}s.", "is_error": True}
+            except Exception as e:
+                print(f"Error calling tool '{tool_use.name}': {e}")
+                return {**result_block, "content": f"Error: {e}", "is_error": True}
+        
+        content = [block.model_dump(exclude_none=True) for block in result.content]
+        if result.isError:
+            return {**result_block, "content": content, "is_error": True}
+        return {**result_block, "content": content}
+    
+    async def process_query(self, query, echo=True, calls=None):
+        """
+        Answer a query, calling tools until the model is done.
+        
+        Args:
+            query: User query
+            echo: Print the response text as it streams
+            calls: List that also receives this query's LLM request stats
+        
+        Returns:
+            Text of the final response
+        """
+        history = self.create_history()
+        history.append('user', query)
         
         while True:
-            response = self.anthropic.messages.create(
-                max_tokens = 2024,
-                model = 'claude-3-7-sonnet-20250219', 
-                tools = self.available_tools,
-                messages = messages
-            )
-            
-            assistant_content = []
-            has_tool_use = False
+            # Old tool results are shortened or dropped to stay within the token budget
+            messages = history.window()
+            # Each tool starts as soon as its tool_use block is complete, while
+            # the rest of the response is still streaming; all of them run
+            # concurrently and their results go back in request order
+            tool_calls = []
+            started = time.perf_counter()
+            first_token = None
+            try:
+                async with self.anthropic.messages.stream(
+                    max_tokens = 2024,
+                    model = self.MODEL, 
+                    messages = messages,
+                    **self.request_prefix()
+                ) as stream:
+                    async for event in stream:
+                        if event.type in ('text', 'input_json') and first_token is None:
+                            first_token = time.perf_counter() - started
+                        if event.type == 'text' and echo:
+                            print(event.text, end="", flush=True)
+                        elif event.type == 'content_block_stop':
+                            if event.content_block.type == 'text' and echo:
+                                print()
+                            elif event.content_block.type == 'tool_use':
+                                tool_calls.append(asyncio.create_task(self.call_tool(event.content_block)))
+                    response = await stream.get_final_message()
+            except BaseException:
+                for tool_call in tool_calls:
+                    tool_call.cancel()
+                raise
             
-            for content in response.content:
-                if content.type == 'text':
-                    print(content.text)
-                    assistant_content.append(content)
-                elif content.type == 'tool_use':
-                    has_tool_use = True
-                    assistant_content.append(content)
-                    messages.append({'role':'assistant', 'content':assistant_content})
-                    
-                    # Get session and call tool
-                    session = self.sessions.get(content.name)
-                    if not session:
-                        print(f"Tool '{content.name}' not found.")
-                        break
-                        
-                    result = await session.call_tool(content.name, arguments=content.input)
-                    messages.append({
-                        "role": "user", 
-                        "content": [
-                            {
-                                "type": "tool_result",
-                                "tool_use_id": content.id,
-                                "content": result.content
-                            }
-                        ]
-                    })
+            call = {
+                'ttft_seconds': first_token,
+                'seconds': time.perf_counter() - started,
+                'input_tokens': response.usage.input_tokens,
+                'output_tokens': response.usage.output_tokens,
+                # Input tokens read from / written to the provider's prompt cache
+                'cache_read_tokens': response.usage.cache_read_input_tokens or 0,
+                'cache_write_tokens': response.usage.cache_creation_input_tokens or 0,
+                'request_bytes': serialized_size(messages),
+                'history_bytes': serialized_size(history.messages),
+                'estimated_tokens': estimate_tokens(messages),
+                'tool_calls': len(tool_calls),
+            }
+            self.llm_calls.append(call)
+            if calls is not None:
+                calls.append(call)
+            history.append('assistant', response.content)
             
             # Exit loop if no tool was used
-            if not has_tool_use:
-                break
+            if not tool_calls:
+                return "".join(block.text for block in response.content if block.type == 'text')
+            
+            tool_results = await asyncio.gather(*tool_calls)
+            history.append('user', list(tool_results))
 
-    async def get_resource(self, resource_uri):
+    async def read_resource_text(self, resource_uri):
+        """
+        Read a resource.
+        
+        Returns:
+            Text of its first content, or None if it has none
+        
+        Raises:
+            LookupError: No server offers the resource
+        """
         session = self.sessions.get(resource_uri)
         
         # Fallback for papers URIs - try any papers resource session
@@ -136,17 +630,24 @@ class MCP_ChatBot:
                     break
             
         if not session:
-            print(f"Resource '{resource_uri}' not found.")
-            return
+            raise LookupError(f"Resource '{resource_uri}' not found.")
         
+        result = await session.read_resource(uri=resource_uri)
+        if result and result.contents:
+            return result.contents[0].text
+        return None
+
+    async def get_resource(self, resource_uri):
         try:
-            result = await session.read_resource(uri=resource_uri)
-            if result and result.contents:
+            text = await self.read_resource_text(resource_uri)
+            if text is not None:
                 print(f"\nResource: {resource_uri}")
                 print("Content:")
-                print(result.contents[0].text)
+                print(text)
             else:
                 print("No content available.")
+        except LookupError as e:
+            print(e)
         except Exception as e:
             print(f"Error: {e}")
     
@@ -165,33 +666,75 @@ class MCP_ChatBot:
                     arg_name = arg.name if hasattr(arg, 'name') else arg.get('name', '')
                     print(f"    - {arg_name}")
     
-    async def execute_prompt(self, prompt_name, args):
-        """Execute a prompt with the given arguments."""
+    async def prompt_text(self, prompt_name, args):
+        """
+        Render a prompt with the given arguments.
+        
+        Returns:
+            Text of its first message, or None if it has none
+        
+        Raises:
+            LookupError: No server offers the prompt
+        """
         session = self.sessions.get(prompt_name)
         if not session:
-            print(f"Prompt '{prompt_name}' not found.")
-            return
+            raise LookupError(f"Prompt '{prompt_name}' not found.")
+        
+        result = await session.get_prompt(prompt_name, arguments=args)
+        if not result or not result.messages:
+            return None
+        prompt_content = result.messages[0].content
         
+        # Extract text from content (handles different formats)
+        if isinstance(prompt_content, str):
+            return prompt_content
+        elif hasattr(prompt_content, 'text'):
+            return prompt_content.text
+        else:
+            # Handle list of content items
+            return " ".join(item.text if hasattr(item, 'text') else str(item) 
+                            for item in prompt_content)
+
+    async def execute_prompt(self, prompt_name, args):
+        """Execute a prompt with the given arguments."""
         try:
-            result = await session.get_prompt(prompt_name, arguments=args)
-            if result and result.messages:
-                prompt_content = result.messages[0].content
-                
-                # Extract text from content (handles different formats)
-                if isinstance(prompt_content, str):
-                    text = prompt_content
-                elif hasattr(prompt_content, 'text'):
-                    text = prompt_content.text
-                else:
-                    # Handle list of content items
-                    text = " ".join(item.text if hasattr(item, 'text') else str(item) 
-                                  for item in prompt_content)
-                
+            text = await self.prompt_text(prompt_name, args)
+            if text is not None:
                 print(f"\nExecuting prompt '{prompt_name}'...")
                 await self.process_query(text)
+        except LookupError as e:
+            print(e)
         except Exception as e:
             print(f"Error: {e}")
     
+    def print_stats(self):
+        """Print the state of every server and the result cache, and time-to-first-token, duration and token usage of the LLM requests."""
+        print(f"\n{'server':<16}{'state':<9}{'starts':>7}{'requests':>10}")
+        for server_name, connection in self.connections.items():
+            state = "running" if connection.connected else "stopped"
+            print(f"{server_name:<16}{state:<9}{connection.starts:>7}{connection.requests:>10}")
+        cache = self.result_cache.stats()
+        print(f"Result cache: {cache['entries']} entries, {cache['hits']} hits, {cache['misses']} misses, "
+              f"{cache['expired']} expired, {cache['evictions']} evicted")
+        
+        if not self.llm_calls:
+            print("No LLM requests yet.")
+            return
+        
+        # sent KB: messages sent with the request; history KB: the full history it was built from
+        # in tok: uncached input tokens; cache rd/wr: input tokens read from / written to the prompt cache
+        print(f"\n{'#':>4}{'TTFT s':>9}{'total s':>9}{'in tok':>9}{'cache rd':>10}{'cache wr':>10}{'out tok':>9}"
+              f"{'sent KB':>9}{'history KB':>12}")
+        for index, call in enumerate(self.llm_calls, start=1):
+            ttft = f"{call['ttft_seconds']:.2f}" if call['ttft_seconds'] is not None else "-"
+            print(f"{index:>4}{ttft:>9}{call['seconds']:>9.2f}{call['input_tokens']:>9}{call['cache_read_tokens']:>10}"
+                  f"{call['cache_write_tokens']:>10}{call['output_tokens']:>9}"
+                  f"{call['request_bytes'] / 1024:>9.1f}{call['history_bytes'] / 1024:>12.1f}")
+        cached = sum(call['cache_read_tokens'] for call in self.llm_calls)
+        total = cached + sum(call['input_tokens'] + call['cache_write_tokens'] for call in self.llm_calls)
+        if total:
+            print(f"{cached / total:.0%} of input tokens read from the prompt cache")
+    
     async def chat_loop(self):
         print("\nMCP Chatbot Started!")
         print("Type your queries or 'quit' to exit.")
@@ -199,10 +742,12 @@ class MCP_ChatBot:
         print("Use @<topic> to search papers in that topic")
         print("Use /prompts to list available prompts")
         print("Use /prompt <name> <arg1=value1> to execute a prompt")
+        print("Use /stats to see server state, LLM latency and token usage")
         
         while True:
             try:
-                query = input("\nQuery: ").strip()
+                # Read in a thread so background tasks keep running while waiting
+                query = (await asyncio.to_thread(input, "\nQuery: ")).strip()
                 if not query:
                     continue
         
@@ -211,13 +756,7 @@ class MCP_ChatBot:
                 
                 # Check for @resource syntax first
                 if query.startswith('@'):
-                    # Remove @ sign  
-                    topic = query[1:]
-                    if topic == "folders":
-                        resource_uri = "papers://folders"
-                    else:
-                        resource_uri = f"papers://{topic}"
-                    await self.get_resource(resource_uri)
+                    await self.get_resource(resource_uri(query))
                     continue
                 
                 # Check for /command syntax
@@ -227,21 +766,14 @@ class MCP_ChatBot:
                     
                     if command == '/prompts':
                         await self.list_prompts()
+                    elif command == '/stats':
+                        self.print_stats()
                     elif command == '/prompt':
                         if len(parts) < 2:
                             print("Usage: /prompt <name> <arg1=value1> <arg2=value2>")
                             continue
                         
-                        prompt_name = parts[1]
-                        args = {}
-                        
-                        # Parse arguments
-                        for arg in parts[2:]:
-                            if '=' in arg:
-                                key, value = arg.split('=', 1)
-                                args[key] = value
-                        
-                        await self.execute_prompt(prompt_name, args)
+                        await self.execute_prompt(parts[1], prompt_arguments(parts[2:]))
                     else:
                         print(f"Unknown command: {command}")
                     continue
@@ -252,11 +784,24 @@ class MCP_ChatBot:
                 print(f"\nError: {str(e)}")
     
     async def cleanup(self):
-        await self.exit_stack.aclose()
+        # Every server task closes its own session and process
+        await asyncio.gather(*(connection.close() for connection in self.connections.values()))
 
 
-async def main():
-    chatbot = MCP_ChatBot()
+async def main(chatbot_class=MCP_ChatBot):
+    parser = argparse.ArgumentParser(description="Chat with the configured MCP servers")
+    parser.add_argument("--record", metavar="CASSETTE", help="record LLM and server responses to a cassette file")
+    parser.add_argument("--replay", metavar="CASSETTE", help="replay a cassette instead of contacting the LLM and servers")
+    parser.add_argument("--latency", type=float, help="seconds added to every replayed response")
+    parser.add_argument("--realtime", action="store_true", help="replay with the recorded response times")
+    args = parser.parse_args()
+    
+    cassette = None
+    if args.record:
+        cassette = Cassette(args.record, mode="record")
+    elif args.replay:
+        cassette = Cassette(args.replay, mode="playback", latency=args.latency, realtime=args.realtime)
+    chatbot = chatbot_class(cassette=cassette)
     try:
         await chatbot.connect_to_servers()
         await chatbot.chat_loop()
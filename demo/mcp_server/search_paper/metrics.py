@@ -0,0 +1,165 @@
+"""
+In-process metrics for the research server.
+
+Every tool and resource handler is wrapped with Metrics.timed, which
+records its latency in a fixed-bucket histogram and counts the calls that
+raised. Other code records its own timings with observe and counters with
+inc. The hot path only bumps a few numbers under a lock; percentiles are
+estimated from the buckets when a snapshot is taken.
+
+render_prometheus formats the same numbers, plus the stats() of the
+server's stores and caches, in the Prometheus text exposition format.
+percentile is the exact counterpart for a list of measured values, used by
+the load test and the batch runner.
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+from typing import Callable, Dict, List
+
+# Upper bounds of the latency buckets in seconds; one more bucket takes the rest
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+class Histogram:
+    def __init__(self, bounds: tuple = BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (capped at the maximum seen)."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        # operation -> latency histogram
+        self._histograms: Dict[str, Histogram] = {}
+        # operation -> number of calls that raised
+        self._errors: Dict[str, int] = {}
+        self._counters: Dict[str, float] = {}
+
+    def observe(self, operation: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(operation)
+            if histogram is None:
+                histogram = self._histograms[operation] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, counter: str, value: float = 1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def _error(self, operation: str):
+        with self._lock:
+            self._errors[operation] = self._errors.get(operation, 0) + 1
+
+    def timed(self, func: Callable) -> Callable:
+        """Decorator recording the latency (and errors) of a sync or async handler."""
+        operation = func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    self._error(operation)
+                    raise
+                finally:
+                    self.observe(operation, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                self._error(operation)
+                raise
+            finally:
+                self.observe(operation, time.perf_counter() - started)
+        return wrapper
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            Uptime, per-operation latency summary (seconds) and counters
+        """
+        with self._lock:
+            operations = {
+                operation: {
+                    "count": histogram.count,
+                    "errors": self._errors.get(operation, 0),
+                    "total_seconds": histogram.sum,
+                    "p50": histogram.quantile(0.50),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                    "max": histogram.max,
+                }
+                for operation, histogram in sorted(self._histograms.items())
+            }
+            return {
+                "uptime_seconds": time.time() - self.started,
+                "operations": operations,
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def render_prometheus(self, components: Dict[str, dict], prefix: str = "research") -> str:
+        """
+        Format the metrics in the Prometheus text format.
+
+        Args:
+            components: stats() of each store/cache by name, exported as gauges
+            prefix: Prefix of every metric name
+        """
+        lines = [f"# TYPE {prefix}_operation_seconds histogram"]
+        with self._lock:
+            for operation, histogram in sorted(self._histograms.items()):
+                label = f'operation="{operation}"'
+                cumulative = 0
+                for bound, count in zip([str(bound) for bound in histogram.bounds] + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_operation_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"{prefix}_operation_seconds_sum{{{label}}} {histogram.sum}")
+                lines.append(f"{prefix}_operation_seconds_count{{{label}}} {histogram.count}")
+            lines.append(f"# TYPE {prefix}_operation_errors_total counter")
+            for operation in sorted(self._histograms):
+                lines.append(f'{prefix}_operation_errors_total{{operation="{operation}"}} {self._errors.get(operation, 0)}')
+            for counter, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE {prefix}_{counter}_total counter")
+                lines.append(f"{prefix}_{counter}_total {value}")
+        for component, stats in components.items():
+            for name, value in stats.items():
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {prefix}_{component}_{name} gauge")
+                    lines.append(f"{prefix}_{component}_{name} {value}")
+        lines.append(f"# TYPE {prefix}_uptime_seconds gauge")
+        lines.append(f"{prefix}_uptime_seconds {time.time() - self.started}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,710 @@
+"""
+Persistent paper store shared by the research MCP servers.
+
+Paper metadata is kept in one append-only JSON-lines log per topic
+(papers/<topic>/papers_info.jsonl). When the store is opened the logs are
+scanned once to build two in-memory indexes:
+
+- paper id -> (topic, byte offset) of the latest record for that paper
+- topic -> {paper id: (byte offset, crc of the record)} (topic membership)
+
+so looking up a paper by id reads a single line from disk instead of
+loading every topic file.
+
+Writes only append records that are new or changed. Each batch is written
+with a single append while holding an exclusive lock on the log, so
+concurrent writers (threads or processes) never interleave or truncate
+records. Once a log holds more superseded records than live ones it is
+compacted into a temporary file and atomically renamed over the original;
+every compaction bumps a generation counter (the size of the topic's .lock
+file) so other writers know to re-index the log rather than trust offsets.
+
+The indexes double as a topic catalogue (paper count and last update per
+topic), so listing topics never scans the directory. To notice writes made
+by other processes, every write also replaces papers/.changes with a new
+token; readers compare one small file (and the modification time of the
+papers directory, so a topic folder deleted by hand is noticed too)
+against what they last saw and only re-index the topic logs when
+something changed. A log deleted from a folder that is still there is
+noticed when a read finds it missing. Listeners registered with
+add_listener are handed the records other processes wrote, and those
+registered with add_removal_listener the ids of papers whose topics were
+deleted from disk, so per-process indexes can follow along.
+
+If papers/corpus.snap exists (export_snapshot, see corpus_snapshot.py) it
+is memory-mapped at startup: topics whose logs still start with what the
+snapshot saw are indexed from it, and only records appended afterwards
+are parsed. Papers unchanged since the snapshot are then read from the
+mapped columns instead of the logs.
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from corpus_snapshot import SNAPSHOT_NAME, Snapshot, TopicState, write_snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+LOG_NAME = "papers_info.jsonl"
+LEGACY_NAME = "papers_info.json"
+CHANGES_NAME = ".changes"
+
+# Compact a topic log once it has at least this many superseded records
+# and they outnumber the live ones
+COMPACT_MIN_DEAD = 64
+
+
+def topic_dir_name(topic: str) -> str:
+    """Map a free-form topic to its folder name under the papers directory."""
+    return topic.lower().replace(" ", "_")
+
+
+@contextmanager
+def locked_file(lock_path: str):
+    """Hold an exclusive lock on lock_path, shared by every process on the machine."""
+    with open(lock_path, "ab") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield lock_file
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _encode(paper_id: str, paper_info: dict) -> bytes:
+    return (json.dumps({"id": paper_id, **paper_info}) + "\n").encode()
+
+
+def record_crc(paper_id: str, paper_info: dict) -> int:
+    """Crc of the log record the store writes for a paper (what PaperStore.stored_crc returns)."""
+    return zlib.crc32(_encode(paper_id, paper_info))
+
+
+class PaperStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.RLock()
+        # paper id -> (topic, offset of its latest record)
+        self._ids: Dict[str, Tuple[str, int]] = {}
+        # topic -> {paper id: (offset, crc32 of the record)}, in first-seen order
+        self._topics: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        # topic -> number of superseded records in its log
+        self._dead: Dict[str, int] = {}
+        # topic -> (generation, size) of the log as far as it has been indexed
+        self._ends: Dict[str, Tuple[int, int]] = {}
+        # topic -> timestamp of the last write
+        self._updated: Dict[str, float] = {}
+        # callbacks for records picked up from other processes' writes
+        self._listeners: List[Callable[[List[Tuple[str, dict]]], None]] = []
+        # callbacks for the ids of papers that were deleted from disk
+        self._removal_listeners: List[Callable[[List[str]], None]] = []
+        # I/O counters for the metrics resource
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.compactions = 0
+        # Memory-mapped corpus snapshot, if one has been exported
+        self.snapshot: Optional[Snapshot] = None
+        # paper id -> (snapshot row, (topic, offset), log generation) of the
+        # record the snapshot holds for it
+        self._snapshot_rows: Dict[str, Tuple[int, Tuple[str, int], int]] = {}
+
+        os.makedirs(root, exist_ok=True)
+        self.migrate_json_layout()
+        self._seen_change = self._change_token()
+        states = self._open_snapshot()
+        for topic in sorted(os.listdir(root)):
+            if os.path.isfile(self._log_path(topic)):
+                if topic not in states or not self._adopt(states[topic]):
+                    self._scan(topic)
+        if self.snapshot is not None:
+            for row in range(len(self.snapshot)):
+                paper_id = self.snapshot.paper_id(row)
+                topic, generation, offset = self.snapshot.location(row)
+                self._snapshot_rows[paper_id] = (row, (topic, offset), generation)
+        self._seen_root_mtime = self._root_mtime()
+
+    def _open_snapshot(self) -> Dict[str, TopicState]:
+        path = os.path.join(self.root, SNAPSHOT_NAME)
+        if not os.path.exists(path):
+            return {}
+        try:
+            self.snapshot = Snapshot(path)
+        except (ValueError, struct.error) as e:
+            print(f"Ignoring snapshot {path}: {e}")
+            return {}
+        return {state.name: state for state in self.snapshot.topics()}
+
+    def _adopt(self, state: TopicState) -> bool:
+        """Index a topic from the snapshot if its log still starts with what the snapshot saw."""
+        topic = state.name
+        if not state.members or state.generation != self._generation(topic):
+            return False
+        if os.path.getsize(self._log_path(topic)) < state.size:
+            return False
+        # A recreated log would not hold the same last record
+        _, offset, crc = max(state.members, key=lambda member: member[1])
+        with open(self._log_path(topic), "rb") as log:
+            log.seek(offset)
+            if zlib.crc32(log.readline()) != crc:
+                return False
+
+        members = self._topics[topic] = {}
+        for paper_id, offset, crc in state.members:
+            members[paper_id] = (offset, crc)
+            self._ids[paper_id] = (topic, offset)
+        self._dead[topic] = state.dead
+        self._ends[topic] = (state.generation, state.size)
+        self._updated[topic] = state.updated
+        # Index whatever was appended after the snapshot
+        self._sync(topic)
+        return True
+
+    def _snapshot_row(self, paper_id: str) -> Optional[int]:
+        """Snapshot row of a paper, if the snapshot still holds its latest record."""
+        entry = self._snapshot_rows.get(paper_id)
+        if entry is None:
+            return None
+        row, location, generation = entry
+        if self._ids.get(paper_id) != location or self._ends.get(location[0], (None,))[0] != generation:
+            return None
+        return row
+
+    def in_snapshot(self, paper_id: str) -> bool:
+        """Whether a paper is unchanged since the corpus snapshot was exported."""
+        with self._lock:
+            return self._snapshot_row(paper_id) is not None
+
+    def _log_path(self, topic: str) -> str:
+        return os.path.join(self.root, topic, LOG_NAME)
+
+    def _lock_path(self, topic: str) -> str:
+        return os.path.join(self.root, topic, ".lock")
+
+    def _generation(self, topic: str) -> int:
+        try:
+            return os.stat(self._lock_path(topic)).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _changes_path(self) -> str:
+        return os.path.join(self.root, CHANGES_NAME)
+
+    def _file_lock(self, topic: str):
+        """Hold the in-process lock and an exclusive lock on the topic directory."""
+        return self._flock(self._lock_path(topic))
+
+    @contextmanager
+    def _flock(self, lock_path: str):
+        with self._lock, locked_file(lock_path) as lock_file:
+            yield lock_file
+
+    def _scan(self, topic: str, start: int = 0):
+        """Index the records of a topic log from byte offset `start` onwards."""
+        previous = self._topics.get(topic, {})
+        if start == 0:
+            self._forget(topic)
+        members = self._topics.setdefault(topic, {})
+        # New or changed records, for the listeners
+        changed = [] if self._listeners else None
+        generation = self._generation(topic)
+        with open(self._log_path(topic), "rb") as log:
+            log.seek(start)
+            offset = start
+            for line in log:
+                if not line.endswith(b"\n"):
+                    # A write still in progress; index it on the next sync
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping corrupt record in {self._log_path(topic)} at {offset}")
+                    self._dead[topic] = self._dead.get(topic, 0) + 1
+                else:
+                    paper_id = record.pop("id")
+                    crc = zlib.crc32(line)
+                    if paper_id in members:
+                        self._dead[topic] = self._dead.get(topic, 0) + 1
+                    if changed is not None and previous.get(paper_id, (None, None))[1] != crc:
+                        changed.append((paper_id, record))
+                    members[paper_id] = (offset, crc)
+                    self._ids[paper_id] = (topic, offset)
+                offset += len(line)
+        self.bytes_read += offset - start
+        self._ends[topic] = (generation, offset)
+        self._updated[topic] = os.path.getmtime(self._log_path(topic))
+        if changed:
+            for listener in self._listeners:
+                listener(changed)
+
+    def add_listener(self, listener: Callable[[List[Tuple[str, dict]]], None]):
+        """Call listener with the (paper id, paper information) records other processes write."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def add_removal_listener(self, listener: Callable[[List[str]], None]):
+        """Call listener with the ids of papers that are gone because their topics were deleted."""
+        with self._lock:
+            self._removal_listeners.append(listener)
+
+    def _remove_topic(self, topic: str):
+        """Forget a topic deleted from disk and tell the removal listeners which papers went with it."""
+        paper_ids = [
+            paper_id for paper_id in self._topics.get(topic, {})
+            if self._ids.get(paper_id, ("",))[0] == topic
+        ]
+        self._forget(topic)
+        removed = []
+        for paper_id in paper_ids:
+            # Fall back to a copy stored under another topic
+            other = next((name for name, members in self._topics.items() if paper_id in members), None)
+            if other is None:
+                removed.append(paper_id)
+            else:
+                self._ids[paper_id] = (other, self._topics[other][paper_id][0])
+        if removed:
+            for listener in self._removal_listeners:
+                listener(removed)
+
+    def _forget(self, topic: str):
+        """Drop every index entry that points into a topic log."""
+        for paper_id in self._topics.pop(topic, {}):
+            if self._ids.get(paper_id, ("",))[0] == topic:
+                del self._ids[paper_id]
+        self._dead[topic] = 0
+        self._ends.pop(topic, None)
+        self._updated.pop(topic, None)
+
+    def _sync(self, topic: str):
+        """Catch up with records appended or compactions done by other writers."""
+        try:
+            log_size = os.stat(self._log_path(topic)).st_size
+        except FileNotFoundError:
+            # The topic was deleted from disk
+            self._remove_topic(topic)
+            return
+        generation, size = self._ends.get(topic, (None, 0))
+        if self._generation(topic) != generation:
+            self._scan(topic)
+        elif log_size > size:
+            self._scan(topic, size)
+
+    def _change_token(self) -> str:
+        try:
+            with open(self._changes_path(), "r") as changes_file:
+                return changes_file.read()
+        except FileNotFoundError:
+            return ""
+
+    def _publish_change(self):
+        """Tell other processes that the logs changed."""
+        with self._flock(self._changes_path() + ".lock"):
+            if self._change_token() != self._seen_change:
+                # Someone else wrote since we last looked; catch up first
+                self._refresh_topics()
+            token = f"{os.getpid()}-{time.time_ns()}"
+            tmp_path = f"{self._changes_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as changes_file:
+                changes_file.write(token)
+            os.replace(tmp_path, self._changes_path())
+            self._seen_change = token
+            self._seen_root_mtime = self._root_mtime()
+
+    def _refresh_topics(self):
+        on_disk = {topic for topic in os.listdir(self.root) if os.path.isfile(self._log_path(topic))}
+        for topic in list(self._topics):
+            if topic not in on_disk:
+                self._remove_topic(topic)
+        for topic in sorted(on_disk):
+            self._sync(topic)
+
+    def _root_mtime(self) -> int:
+        """Modification time of the papers directory, which moves when a topic folder is deleted."""
+        return os.stat(self.root).st_mtime_ns
+
+    def refresh(self) -> bool:
+        """
+        Pick up topics and records written by other processes, and topics
+        deleted from disk.
+
+        Returns:
+            True if something changed and the logs were re-indexed
+        """
+        token = self._change_token()
+        with self._lock:
+            if token == self._seen_change and self._root_mtime() == self._seen_root_mtime:
+                return False
+            self._seen_change = token
+            self._refresh_topics()
+            self._seen_root_mtime = self._root_mtime()
+            return True
+
+    def _read(self, topic: str, offset: int) -> dict:
+        with open(self._log_path(topic), "rb") as log:
+            log.seek(offset)
+            line = log.readline()
+        self.bytes_read += len(line)
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return {}
+
+    def _read_lines(self, topic: str, members: List[Tuple[str, int]]) -> Iterator[Tuple[str, Optional[dict]]]:
+        """Yield (paper id, record) for (paper id, offset) pairs, None if the offset no longer holds the paper."""
+        try:
+            log = open(self._log_path(topic), "rb")
+        except FileNotFoundError:
+            # The topic was deleted from disk
+            with self._lock:
+                self._remove_topic(topic)
+            return
+        with log:
+            # Read the log front to back
+            for paper_id, offset in sorted(members, key=lambda member: member[1]):
+                log.seek(offset)
+                line = log.readline()
+                self.bytes_read += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                if not isinstance(record, dict) or record.pop("id", None) != paper_id:
+                    record = None
+                yield paper_id, record
+
+    def _read_records(self, topic: str, members: List[Tuple[str, int]]) -> Iterator[Tuple[str, dict]]:
+        """
+        Yield (paper id, paper information) for (paper id, offset) pairs of a topic log.
+
+        The offsets may predate a compaction by another process. Records
+        that do not hold their paper are read again after re-indexing the
+        log, under its lock so it cannot be compacted again meanwhile.
+        """
+        stale = []
+        for paper_id, record in self._read_lines(topic, members):
+            if record is None:
+                stale.append(paper_id)
+            else:
+                yield paper_id, record
+        if not stale:
+            return
+        with self._file_lock(topic):
+            self._sync(topic)
+            current = self._topics.get(topic, {})
+            members = [(paper_id, current[paper_id][0]) for paper_id in stale if paper_id in current]
+            records = list(self._read_lines(topic, members))
+        for paper_id, record in records:
+            if record is not None:
+                yield paper_id, record
+
+    def migrate_json_layout(self) -> int:
+        """
+        One-shot import of the legacy papers/<topic>/papers_info.json files.
+
+        Each legacy file is rewritten as a JSON-lines log and renamed to
+        papers_info.json.bak so it is not imported again.
+
+        Returns:
+            Number of topics migrated
+        """
+        migrated = 0
+        for topic in os.listdir(self.root):
+            legacy_path = os.path.join(self.root, topic, LEGACY_NAME)
+            if not os.path.isfile(legacy_path) or os.path.exists(self._log_path(topic)):
+                continue
+            try:
+                with open(legacy_path, "r") as json_file:
+                    papers_info = json.load(json_file)
+            except json.JSONDecodeError as e:
+                print(f"Error reading {legacy_path}: {str(e)}")
+                continue
+
+            tmp_path = self._log_path(topic) + ".tmp"
+            with open(tmp_path, "wb") as log:
+                for paper_id, paper_info in papers_info.items():
+                    log.write(_encode(paper_id, paper_info))
+            os.replace(tmp_path, self._log_path(topic))
+            os.replace(legacy_path, legacy_path + ".bak")
+            migrated += 1
+        return migrated
+
+    def add_papers(self, topic: str, papers_info: Dict[str, dict]) -> str:
+        """
+        Append new or changed paper records to a topic log and index them.
+
+        Args:
+            topic: The topic the papers were found for
+            papers_info: Mapping of paper id to paper information
+
+        Returns:
+            Path of the topic log
+        """
+        file_path, changed = self._append(topic, papers_info)
+        if changed:
+            self._publish_change()
+        return file_path
+
+    def add_batch(self, papers_by_topic: Dict[str, Dict[str, dict]]) -> Dict[str, str]:
+        """
+        Append the papers of several topics, publishing a single change.
+
+        Args:
+            papers_by_topic: Mapping of topic to {paper id: paper information}
+
+        Returns:
+            Mapping of topic to the path of its log
+        """
+        file_paths = {}
+        changed = False
+        for topic, papers_info in papers_by_topic.items():
+            file_paths[topic], topic_changed = self._append(topic, papers_info)
+            changed = changed or topic_changed
+        if changed:
+            self._publish_change()
+        return file_paths
+
+    def _append(self, topic: str, papers_info: Dict[str, dict]) -> Tuple[str, bool]:
+        topic = topic_dir_name(topic)
+        file_path = self._log_path(topic)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with self._file_lock(topic) as lock_file:
+            self._sync(topic)
+            members = self._topics.setdefault(topic, {})
+
+            # Only write records that differ from what the log already holds
+            lines = []
+            for paper_id, paper_info in papers_info.items():
+                line = _encode(paper_id, paper_info)
+                known = members.get(paper_id)
+                if known is None or known[1] != zlib.crc32(line):
+                    lines.append((paper_id, line))
+            if not lines:
+                return file_path, False
+
+            fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                offset = os.fstat(fd).st_size
+                self.bytes_written += os.write(fd, b"".join(line for _, line in lines))
+            finally:
+                os.close(fd)
+
+            for paper_id, line in lines:
+                if paper_id in members:
+                    self._dead[topic] = self._dead.get(topic, 0) + 1
+                members[paper_id] = (offset, zlib.crc32(line))
+                self._ids[paper_id] = (topic, offset)
+                offset += len(line)
+            self._ends[topic] = (self._ends.get(topic, (self._generation(topic), 0))[0], offset)
+            self._updated[topic] = time.time()
+
+            dead = self._dead.get(topic, 0)
+            if dead >= COMPACT_MIN_DEAD and dead > len(members):
+                self._compact(topic, lock_file)
+        return file_path, True
+
+    def compact(self, topic: str):
+        """Rewrite a topic log so it only holds the latest record of each paper."""
+        topic = topic_dir_name(topic)
+        if topic not in self._topics:
+            return
+        with self._file_lock(topic) as lock_file:
+            self._sync(topic)
+            self._compact(topic, lock_file)
+
+    def _compact(self, topic: str, lock_file):
+        file_path = self._log_path(topic)
+        tmp_path = file_path + ".tmp"
+        members = self._topics[topic]
+        with open(file_path, "rb") as log, open(tmp_path, "wb") as tmp:
+            for paper_id, (offset, _) in members.items():
+                log.seek(offset)
+                tmp.write(log.readline())
+            tmp.flush()
+            self.bytes_written += tmp.tell()
+            self.compactions += 1
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, file_path)
+        # Bump the generation so other writers re-index the new file
+        lock_file.write(b".")
+        lock_file.flush()
+        self._scan(topic)
+        self._publish_change()
+
+    def get(self, paper_id: str) -> Optional[dict]:
+        """Return the stored information for a paper id, or None."""
+        with self._lock:
+            location = self._ids.get(paper_id)
+            if location is None and self.refresh():
+                location = self._ids.get(paper_id)
+            if location is None:
+                return None
+            row = self._snapshot_row(paper_id)
+            if row is not None:
+                return self.snapshot.paper(row)
+            try:
+                record = self._read(*location)
+                if record.get("id") != paper_id:
+                    # Another process compacted the log; re-index and retry
+                    # under its lock so it cannot be compacted again meanwhile
+                    with self._file_lock(location[0]):
+                        self._sync(location[0])
+                        location = self._ids.get(paper_id)
+                        if location is None:
+                            return None
+                        record = self._read(*location)
+            except FileNotFoundError:
+                # The topic was deleted from disk; the paper may be stored under another
+                self._remove_topic(location[0])
+                return self.get(paper_id)
+        record.pop("id", None)
+        return record
+
+    def paper_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._ids)
+
+    def stored_crc(self, paper_id: str) -> Optional[int]:
+        """Crc of a paper's latest record, from the index (no disk access)."""
+        with self._lock:
+            location = self._ids.get(paper_id)
+            if location is None:
+                return None
+            return self._topics[location[0]][paper_id][1]
+
+    def iter_papers(self, paper_ids: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Yield (paper id, paper information) once for every stored paper.
+
+        Args:
+            paper_ids: Only yield these papers (default: all)
+        """
+        with self._lock:
+            if paper_ids is None:
+                paper_ids = list(self._ids)
+            snapshot_rows: List[Tuple[int, str]] = []
+            by_topic: Dict[str, List[Tuple[str, int]]] = {}
+            for paper_id in paper_ids:
+                location = self._ids.get(paper_id)
+                if location is None:
+                    continue
+                row = self._snapshot_row(paper_id)
+                if row is not None:
+                    snapshot_rows.append((row, paper_id))
+                else:
+                    by_topic.setdefault(location[0], []).append((paper_id, location[1]))
+        # Mapped rows first, in file order
+        for row, paper_id in sorted(snapshot_rows):
+            yield paper_id, self.snapshot.paper(row)
+        for topic, members in by_topic.items():
+            yield from self._read_records(topic, members)
+
+    def paper_topics(self, paper_id: str) -> List[str]:
+        """Return every topic a paper is stored under."""
+        with self._lock:
+            return [topic for topic, members in self._topics.items() if paper_id in members]
+
+    def topics(self) -> List[str]:
+        """Return the names of all topics that have stored papers."""
+        self.refresh()
+        with self._lock:
+            return [topic for topic, members in self._topics.items() if members]
+
+    def catalogue(self) -> List[Tuple[str, int, float]]:
+        """
+        Return (topic, number of papers, last update timestamp) for every
+        topic, most recently updated first.
+        """
+        self.refresh()
+        with self._lock:
+            entries = [
+                (topic, len(members), self._updated.get(topic, 0.0))
+                for topic, members in self._topics.items()
+                if members
+            ]
+        return sorted(entries, key=lambda entry: entry[2], reverse=True)
+
+    def has_topic(self, topic: str) -> bool:
+        self.refresh()
+        with self._lock:
+            return bool(self._topics.get(topic_dir_name(topic)))
+
+    def iter_topic(self, topic: str, start: int = 0, limit: Optional[int] = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Yield (paper id, paper information) for the papers of a topic.
+
+        Args:
+            topic: The topic to read
+            start: Position of the first paper to yield (default: 0)
+            limit: Maximum number of papers to yield (default: all)
+        """
+        topic = topic_dir_name(topic)
+        with self._lock:
+            stop = None if limit is None else start + limit
+            members = [
+                (paper_id, offset)
+                for paper_id, (offset, _) in islice(self._topics.get(topic, {}).items(), start, stop)
+            ]
+        if not members:
+            return
+        # Yield the page in topic order, not in the order it was read
+        records = dict(self._read_records(topic, members))
+        for paper_id, _ in members:
+            if paper_id in records:
+                yield paper_id, records[paper_id]
+
+    def topic_size(self, topic: str) -> int:
+        with self._lock:
+            return len(self._topics.get(topic_dir_name(topic), {}))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "topics": sum(1 for members in self._topics.values() if members),
+                "papers": len(self._ids),
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "compactions": self.compactions,
+                "snapshot_papers": len(self._snapshot_rows),
+            }
+
+    def export_snapshot(self, path: Optional[str] = None) -> int:
+        """
+        Write every paper and the topic index to a columnar snapshot.
+
+        Args:
+            path: Snapshot file (default: papers/corpus.snap, loaded at startup)
+
+        Returns:
+            Size of the snapshot in bytes
+        """
+        path = path or os.path.join(self.root, SNAPSHOT_NAME)
+        with ExitStack() as stack:
+            self.refresh()
+            topics = sorted(self._topics)
+            # No compaction may move records while they are copied
+            for topic in topics:
+                stack.enter_context(self._file_lock(topic))
+                self._sync(topic)
+            states = [
+                TopicState(
+                    name=topic,
+                    generation=self._ends[topic][0],
+                    size=self._ends[topic][1],
+                    dead=self._dead.get(topic, 0),
+                    updated=self._updated.get(topic, 0.0),
+                    members=[(paper_id, offset, crc) for paper_id, (offset, crc) in self._topics[topic].items()],
+                )
+                for topic in topics
+                if topic in self._ends
+            ]
+            papers = [(paper_id, paper_info, *self._ids[paper_id]) for paper_id, paper_info in self.iter_papers()]
+        return write_snapshot(path, papers, states)
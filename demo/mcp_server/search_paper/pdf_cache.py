@@ -0,0 +1,162 @@
+"""
+Content-addressed cache of paper PDFs and their extracted text.
+
+PDFs are downloaded by a bounded worker pool and stored as
+papers/pdfs/<sha256>.pdf, so the same file found under several topics (or
+URLs) is kept once. Its text is extracted once into
+papers/pdfs/<sha256>.chunks.json, a list of roughly CHUNK_CHARS-sized
+chunks that are served on demand. papers/pdfs/urls.json maps each PDF URL
+to its digest, so repeated reads never touch the network. Server processes
+sharing the directory merge their urls.json updates under a file lock.
+
+Set PDF_BASE_URL (e.g. http://127.0.0.1:8002 in front of
+`python -m http.server`) to fetch from a local stand-in instead of arxiv.org.
+Text is extracted with pypdf.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+import requests
+from pypdf import PdfReader
+
+from paper_store import locked_file
+
+CHUNK_CHARS = 4000
+# Number of extracted papers kept in memory; the rest are re-read from disk
+MEMORY_PAPERS = 32
+
+
+def split_chunks(text: str, chunk_chars: int = CHUNK_CHARS) -> List[str]:
+    """Split text into chunks of about chunk_chars, preferring paragraph breaks."""
+    chunks = []
+    while text:
+        if len(text) <= chunk_chars:
+            chunks.append(text)
+            break
+        cut = text.rfind("\n\n", 0, chunk_chars)
+        if cut < chunk_chars // 2:
+            cut = text.rfind(" ", 0, chunk_chars)
+        if cut < chunk_chars // 2:
+            cut = chunk_chars
+        chunks.append(text[:cut].strip())
+        text = text[cut:].lstrip()
+    return chunks
+
+
+def extract_text(pdf_bytes: bytes) -> str:
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+class PdfCache:
+    def __init__(self, directory: str, workers: int = 4):
+        self.directory = directory
+        self.base_url = os.environ.get("PDF_BASE_URL", "").rstrip("/")
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf")
+        self.downloads = 0
+        self.bytes_downloaded = 0
+        self.memory_hits = 0
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        # digest -> extracted chunks of recently read papers
+        self._chunks: "OrderedDict[str, List[str]]" = OrderedDict()
+        # pdf url -> future shared by concurrent readers of the same paper
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._urls_path = os.path.join(directory, "urls.json")
+        try:
+            with open(self._urls_path, "r") as urls_file:
+                self._urls: Dict[str, str] = json.load(urls_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._urls = {}
+
+    def _path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.directory, digest + suffix)
+
+    def _write_atomic(self, path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+
+    def _download(self, url: str) -> str:
+        """Fetch a PDF (blocking), store it under its digest and return the digest."""
+        if self.base_url:
+            url = self.base_url + urlsplit(url).path
+        response = self._session.get(url, timeout=60)
+        response.raise_for_status()
+        pdf_bytes = response.content
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        if not os.path.exists(self._path(digest, ".pdf")):
+            self._write_atomic(self._path(digest, ".pdf"), pdf_bytes)
+        with self._lock:
+            self.downloads += 1
+            self.bytes_downloaded += len(pdf_bytes)
+        return digest
+
+    def _load_chunks(self, url: str) -> List[str]:
+        """Download and extract a PDF unless it is already on disk (blocking)."""
+        with self._lock:
+            digest = self._urls.get(url)
+        if digest is None or not os.path.exists(self._path(digest, ".pdf")):
+            digest = self._download(url)
+            with self._lock, locked_file(self._urls_path + ".lock"):
+                # Keep the urls other processes downloaded meanwhile
+                try:
+                    with open(self._urls_path, "r") as urls_file:
+                        self._urls.update(json.load(urls_file))
+                except (FileNotFoundError, json.JSONDecodeError):
+                    pass
+                self._urls[url] = digest
+                self._write_atomic(self._urls_path, json.dumps(self._urls, indent=2).encode())
+
+        chunks_path = self._path(digest, ".chunks.json")
+        if os.path.exists(chunks_path):
+            with open(chunks_path, "r") as chunks_file:
+                chunks = json.load(chunks_file)
+        else:
+            with open(self._path(digest, ".pdf"), "rb") as pdf_file:
+                chunks = split_chunks(extract_text(pdf_file.read()))
+            self._write_atomic(chunks_path, json.dumps(chunks).encode())
+        with self._lock:
+            self._chunks[digest] = chunks
+            while len(self._chunks) > MEMORY_PAPERS:
+                self._chunks.popitem(last=False)
+        return chunks
+
+    async def chunks(self, url: str) -> List[str]:
+        """Return the text chunks of the PDF at url, fetching it at most once."""
+        with self._lock:
+            digest = self._urls.get(url)
+            if digest in self._chunks:
+                self.memory_hits += 1
+                self._chunks.move_to_end(digest)
+                return self._chunks[digest]
+
+        inflight = self._inflight.get(url)
+        if inflight is None:
+            inflight = asyncio.get_running_loop().run_in_executor(self.pool, self._load_chunks, url)
+            self._inflight[url] = inflight
+        try:
+            return await asyncio.shield(inflight)
+        finally:
+            if self._inflight.get(url) is inflight:
+                del self._inflight[url]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "downloads": self.downloads,
+                "bytes_downloaded": self.bytes_downloaded,
+                "memory_hits": self.memory_hits,
+                "papers_in_memory": len(self._chunks),
+            }
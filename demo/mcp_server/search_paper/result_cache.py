@@ -0,0 +1,59 @@
+"""
+In-process cache of MCP tool results and resource reads for the chatbot.
+
+Entries are keyed by (server, tool name or resource URI, arguments), with
+the arguments serialized canonically (sorted keys, no whitespace) so that
+the same call written differently by the model still hits. Every entry
+carries its own TTL, as configured per server and tool in
+server_config.json, and the least recently used entries are evicted once
+the cache is full. Only successful results should be stored.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def canonical_key(server: str, name: str, arguments: Optional[dict] = None) -> str:
+    return json.dumps([server, name, arguments or {}], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        # key -> (expires at, result), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached result, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() >= entry[0]:
+            del self._entries[key]
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, result: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
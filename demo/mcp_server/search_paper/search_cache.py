@@ -0,0 +1,135 @@
+"""
+Result cache for arXiv searches.
+
+Maps a normalized (query, max_results) pair to the paper ids arXiv
+returned, so repeated searches within the TTL are answered from the paper
+store without another API call. Entries are evicted least-recently-used
+once the cache is full and the cache is persisted to a JSON file so it
+survives server restarts. Saves merge in what other server processes wrote
+to the file, under a file lock, so workers sharing papers/ keep each
+other's entries.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from paper_store import locked_file
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and collapse runs of whitespace."""
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    def __init__(self, path: str, ttl: float = 6 * 3600, max_entries: int = 256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (stored at, paper ids), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Keys evicted since the last save, not to be merged back from the file
+        self._evicted = set()
+        self._load()
+
+    @staticmethod
+    def _key(query: str, max_results: int) -> str:
+        return f"{normalize_query(query)}|{max_results}"
+
+    def _read(self) -> "OrderedDict[str, tuple]":
+        """Unexpired entries of the cache file, least recently used first."""
+        try:
+            with open(self.path, "r") as cache_file:
+                entries = json.load(cache_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return OrderedDict()
+        now = time.time()
+        return OrderedDict(
+            (key, (stored_at, paper_ids))
+            for key, (stored_at, paper_ids) in entries.items()
+            if now - stored_at < self.ttl
+        )
+
+    def _load(self):
+        self._entries.update(self._read())
+
+    def _save(self):
+        # File I/O happens outside self._lock, so lookups never wait for it
+        with locked_file(self.path + ".lock"):
+            on_disk = self._read()
+            with self._lock:
+                # Keep entries other processes saved since we last looked, as
+                # older than every entry this process used so they are evicted
+                # first (without counting them as our evictions)
+                merged = OrderedDict()
+                for key, entry in on_disk.items():
+                    current = self._entries.get(key)
+                    if current is None and key not in self._evicted:
+                        merged[key] = entry
+                    elif current is not None and current[0] < entry[0]:
+                        # A newer result for a key we use; keep our LRU position
+                        self._entries[key] = entry
+                merged.update(self._entries)
+                while len(merged) > self.max_entries:
+                    merged.popitem(last=False)
+                self._entries = merged
+                self._evicted.clear()
+                data = json.dumps(merged)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as cache_file:
+                cache_file.write(data)
+            os.replace(tmp_path, self.path)
+
+    def get(self, query: str, max_results: int) -> Optional[List[str]]:
+        """Return the cached paper ids for a search, or None on a miss."""
+        key = self._key(query, max_results)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] >= self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, query: str, max_results: int, paper_ids: List[str]):
+        """
+        Cache the paper ids returned for a search and save the cache file.
+
+        The save takes a file lock and rewrites the file, so call this from
+        a worker thread, not the event loop.
+        """
+        key = self._key(query, max_results)
+        with self._lock:
+            self._entries[key] = (time.time(), list(paper_ids))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._evicted.add(self._entries.popitem(last=False)[0])
+                self.evictions += 1
+        self._save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
@@ -1,16 +1,103 @@
-import arxiv
+import asyncio
 import json
 import os
-from typing import List
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlencode
 from mcp.server.fastmcp import FastMCP
+from arxiv_client import ArxivScheduler
+from metrics import Metrics
+from paper_store import PaperStore
+from pdf_cache import PdfCache
+from search_cache import SearchCache
+from text_index import TextIndex
+from vector_index import VectorIndex
 
 PAPER_DIR = "papers"
 
+# Papers per page of the papers://{topic} resource
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# Shared paper store (imports legacy papers_info.json folders on first start)
+store = PaperStore(PAPER_DIR)
+
+# Cache of arXiv search results, persisted next to the papers
+search_cache = SearchCache(os.path.join(PAPER_DIR, "search_cache.json"), ttl=6 * 3600, max_entries=256)
+
+# Keyword (BM25) index over every stored paper, kept up to date by search_papers
+text_index = TextIndex()
+text_index.add_papers(store.iter_papers())
+
+# Hashed-embedding vectors of every stored paper for semantic search and
+# near-duplicate detection (memory-mapped from papers/vectors)
+vector_index = VectorIndex(os.path.join(PAPER_DIR, "vectors"))
+# Only read and embed papers whose stored record differs from the one
+# their vector was made from
+vector_index.add_papers(store.iter_papers([
+    paper_id for paper_id in store.paper_ids()
+    if vector_index.embedded_crc(paper_id) != store.stored_crc(paper_id)
+]))
+# Vectors of papers whose topics were deleted while no server was running
+stored_ids = set(store.paper_ids())
+vector_index.remove_papers([paper_id for paper_id in vector_index.paper_ids() if paper_id not in stored_ids])
+
+# Papers stored by other server processes (sse_server.py --workers) are
+# indexed when this process picks them up from the shared logs
+store.add_listener(lambda papers: index_papers(dict(papers)))
+# and papers of topic folders deleted from disk are dropped from both
+store.add_removal_listener(lambda paper_ids: unindex_papers(paper_ids))
+
+# Process-wide arXiv client: pooled connections, rate limiting shared by
+# all concurrent searches, and coalescing of identical in-flight queries
+arxiv_scheduler = ArxivScheduler(workers=4, delay_seconds=3.0)
+
+# Downloaded PDFs and their extracted text, shared across topics
+pdf_cache = PdfCache(os.path.join(PAPER_DIR, "pdfs"), workers=4)
+
+# Latency histograms of every tool/resource and other hot-path counters
+metrics = Metrics()
+
 # Initialize FastMCP server
 mcp = FastMCP("research")
 
+async def find_papers(topic: str, max_results: int) -> Tuple[Dict[str, dict], bool]:
+    """
+    Get the papers arXiv returns for a topic, from the search cache if possible.
+    
+    Returns:
+        (paper information by paper ID, whether it came from the cache)
+    """
+    # Answer repeated searches from the cache while the papers are still stored
+    cached_ids = search_cache.get(topic, max_results)
+    if cached_ids is not None:
+        papers_info = {paper_id: store.get(paper_id) for paper_id in cached_ids}
+        if all(paper_info is not None for paper_info in papers_info.values()):
+            return papers_info, True
+    
+    # Page through arXiv in the scheduler's pool
+    started = time.perf_counter()
+    papers_info = await arxiv_scheduler.search(topic, max_results)
+    metrics.observe("arxiv_search", time.perf_counter() - started)
+    metrics.inc("arxiv_search_results", len(papers_info))
+    # Saving the cache rewrites its file under a lock; keep that off the event loop
+    await asyncio.to_thread(search_cache.put, topic, max_results, list(papers_info))
+    return papers_info, False
+
+def index_papers(papers_info: Dict[str, dict]):
+    """Add freshly fetched papers to the keyword and vector indexes."""
+    text_index.add_papers(papers_info.items())
+    vector_index.add_papers(papers_info.items())
+
+def unindex_papers(paper_ids: List[str]):
+    """Drop papers whose topic folders were deleted from the keyword and vector indexes."""
+    text_index.remove_papers(paper_ids)
+    vector_index.remove_papers(paper_ids)
+
 @mcp.tool()
-def search_papers(topic: str, max_results: int = 5) -> List[str]:
+@metrics.timed
+async def search_papers(topic: str, max_results: int = 5) -> List[str]:
     """
     Search for papers on arXiv based on a topic and store their information.
     
@@ -21,54 +108,70 @@ def search_papers(topic: str, max_results: int = 5) -> List[str]:
     Returns:
         List of paper IDs found in the search
     """
+    started = time.perf_counter()
     
-    # Use arxiv to find the papers 
-    client = arxiv.Client()
-
-    # Search for the most relevant articles matching the queried topic
-    search = arxiv.Search(
-        query = topic,
-        max_results = max_results,
-        sort_by = arxiv.SortCriterion.Relevance
-    )
-
-    papers = client.results(search)
+    papers_info, cached = await find_papers(topic, max_results)
+    file_path = await asyncio.to_thread(store.add_papers, topic, papers_info)
+    if not cached:
+        index_papers(papers_info)
     
-    # Create directory for this topic
-    path = os.path.join(PAPER_DIR, topic.lower().replace(" ", "_"))
-    os.makedirs(path, exist_ok=True)
+    print(f"Results are saved in: {file_path} ({'cached, ' if cached else ''}{time.perf_counter() - started:.2f}s)")
     
-    file_path = os.path.join(path, "papers_info.json")
+    return list(papers_info)
 
-    # Try to load existing papers info
-    try:
-        with open(file_path, "r") as json_file:
-            papers_info = json.load(json_file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        papers_info = {}
-
-    # Process each paper and add to papers_info  
-    paper_ids = []
-    for paper in papers:
-        paper_ids.append(paper.get_short_id())
-        paper_info = {
-            'title': paper.title,
-            'authors': [author.name for author in paper.authors],
-            'summary': paper.summary,
-            'pdf_url': paper.pdf_url,
-            'published': str(paper.published.date())
-        }
-        papers_info[paper.get_short_id()] = paper_info
+@mcp.tool()
+@metrics.timed
+async def search_papers_batch(topics: List[str], max_results: int = 5) -> str:
+    """
+    Search arXiv for several topics at once and store the papers of all of them.
+    Prefer this over calling search_papers once per topic.
+    
+    Args:
+        topics: The topics to search for
+        max_results: Maximum number of results to retrieve per topic (default: 5)
+        
+    Returns:
+        JSON string with the paper IDs and search time per topic, plus the
+        number of distinct papers found across all topics
+    """
+    started = time.perf_counter()
+    
+    async def timed_search(topic):
+        topic_started = time.perf_counter()
+        papers_info, cached = await find_papers(topic, max_results)
+        return papers_info, cached, time.perf_counter() - topic_started
+    
+    # The scheduler's pool bounds how many searches hit arXiv at once
+    results = await asyncio.gather(*(timed_search(topic) for topic in topics), return_exceptions=True)
+    
+    summary = {}
+    papers_by_topic = {}
+    fetched = {}
+    for topic, result in zip(topics, results):
+        if isinstance(result, Exception):
+            summary[topic] = {'error': str(result)}
+            continue
+        papers_info, cached, seconds = result
+        papers_by_topic[topic] = papers_info
+        if not cached:
+            fetched.update(papers_info)
+        summary[topic] = {'paper_ids': list(papers_info), 'cached': cached, 'seconds': round(seconds, 3)}
     
-    # Save updated papers_info to json file
-    with open(file_path, "w") as json_file:
-        json.dump(papers_info, json_file, indent=2)
+    # One storage pass for every topic, and each distinct paper indexed once
+    await asyncio.to_thread(store.add_batch, papers_by_topic)
+    index_papers(fetched)
     
-    print(f"Results are saved in: {file_path}")
+    unique_papers = {paper_id for papers_info in papers_by_topic.values() for paper_id in papers_info}
+    print(f"Batch of {len(topics)} topics saved ({time.perf_counter() - started:.2f}s)")
     
-    return paper_ids
+    return json.dumps({
+        'topics': summary,
+        'unique_papers': len(unique_papers),
+        'seconds': round(time.perf_counter() - started, 3)
+    }, indent=2)
 
 @mcp.tool()
+@metrics.timed
 def extract_info(paper_id: str) -> str:
     """
     Search for information about a specific paper across all topic directories.
@@ -80,87 +183,296 @@ def extract_info(paper_id: str) -> str:
         JSON string with paper information if found, error message if not found
     """
  
-    for item in os.listdir(PAPER_DIR):
-        item_path = os.path.join(PAPER_DIR, item)
-        if os.path.isdir(item_path):
-            file_path = os.path.join(item_path, "papers_info.json")
-            if os.path.isfile(file_path):
-                try:
-                    with open(file_path, "r") as json_file:
-                        papers_info = json.load(json_file)
-                        if paper_id in papers_info:
-                            return json.dumps(papers_info[paper_id], indent=2)
-                except (FileNotFoundError, json.JSONDecodeError) as e:
-                    print(f"Error reading {file_path}: {str(e)}")
-                    continue
+    paper_info = store.get(paper_id)
+    if paper_info is not None:
+        return json.dumps(paper_info, indent=2)
     
     return f"There's no saved information related to paper {paper_id}."
 
+@mcp.tool()
+@metrics.timed
+async def read_paper(paper_id: str, start_chunk: int = 0, num_chunks: int = 1) -> str:
+    """
+    Read the full text of a stored paper, a few chunks (about 4000 characters
+    each) at a time. The PDF is downloaded and converted to text on first use
+    and read from the local cache afterwards.
+    
+    Args:
+        paper_id: The ID of the paper to read
+        start_chunk: Index of the first chunk to return (default: 0)
+        num_chunks: Number of chunks to return (default: 1, max: 5)
+        
+    Returns:
+        The requested chunks of the paper's text, or an error message
+    """
+    
+    paper_info = store.get(paper_id)
+    if paper_info is None:
+        return f"There's no saved information related to paper {paper_id}."
+    
+    try:
+        chunks = await pdf_cache.chunks(paper_info['pdf_url'])
+    except Exception as e:
+        return f"Error reading the PDF of paper {paper_id}: {str(e)}"
+    
+    start_chunk = max(start_chunk, 0)
+    selected = chunks[start_chunk:start_chunk + min(max(num_chunks, 1), 5)]
+    if not selected:
+        return f"Paper {paper_id} has {len(chunks)} chunks; start_chunk {start_chunk} is out of range."
+    
+    parts = [f"# {paper_info['title']}\n\n"]
+    for index, chunk in enumerate(selected, start=start_chunk):
+        parts.append(f"## Chunk {index + 1} of {len(chunks)}\n\n{chunk}\n\n")
+    end_chunk = start_chunk + len(selected)
+    if end_chunk < len(chunks):
+        parts.append(f"Continue with read_paper(paper_id='{paper_id}', start_chunk={end_chunk}).\n")
+    
+    return "".join(parts)
+
+@mcp.tool()
+@metrics.timed
+def search_local_papers(query: str, max_results: int = 10) -> str:
+    """
+    Search the papers already stored locally (across all topics) by keywords
+    in their title, authors and summary. Much faster than search_papers, so
+    try it first for variants of topics that have been searched before.
+    
+    Args:
+        query: Keywords to search for
+        max_results: Maximum number of results to return (default: 10)
+        
+    Returns:
+        JSON string with the best matching paper IDs, titles and BM25 scores
+    """
+    
+    store.refresh()
+    # Skip papers whose topic folders were deleted since they were indexed
+    matches = [match for match in text_index.search(query, max_results) if store.get(match[0]) is not None]
+    if not matches:
+        return f"No stored papers match '{query}'. Use search_papers to search arXiv."
+    
+    return json.dumps([
+        {'paper_id': paper_id, 'title': title, 'score': round(score, 3)}
+        for paper_id, title, score in matches
+    ], indent=2)
 
 
+
+@mcp.tool()
+@metrics.timed
+def semantic_search_papers(query: str, max_results: int = 10) -> str:
+    """
+    Find stored papers (across all topics) whose title and summary are most
+    similar to a free-text description, even without exact keyword matches.
+    
+    Args:
+        query: A description of what the papers should be about
+        max_results: Maximum number of results to return (default: 10)
+        
+    Returns:
+        JSON string with the closest paper IDs, titles, topics and similarity
+    """
+    
+    store.refresh()
+    # Skip papers whose topic folders were deleted since they were indexed
+    matches = [
+        (paper_id, paper_info, score)
+        for paper_id, score in vector_index.search(query, max_results)
+        for paper_info in [store.get(paper_id)]
+        if paper_info is not None
+    ]
+    if not matches:
+        return f"No stored papers are similar to '{query}'. Use search_papers to search arXiv."
+    
+    return json.dumps([
+        {
+            'paper_id': paper_id,
+            'title': paper_info['title'],
+            'topics': store.paper_topics(paper_id),
+            'similarity': round(score, 3)
+        }
+        for paper_id, paper_info, score in matches
+    ], indent=2)
+
+@mcp.tool()
+@metrics.timed
+def find_duplicate_papers(paper_id: str = "", threshold: float = 0.9) -> str:
+    """
+    Find near-duplicate papers across all topic folders.
+    
+    Args:
+        paper_id: Only look for duplicates of this paper (default: all papers)
+        threshold: Minimum cosine similarity to count as a duplicate (default: 0.9)
+        
+    Returns:
+        JSON string with pairs of similar papers and the topics they are stored under
+    """
+    
+    store.refresh()
+    if paper_id:
+        pairs = [(paper_id, other_id, score) for other_id, score in vector_index.similar(paper_id) if score >= threshold]
+    else:
+        pairs = vector_index.near_duplicates(threshold)
+    # Skip papers whose topic folders were deleted since they were indexed
+    papers_info = {pid: store.get(pid) for pair in pairs for pid in pair[:2]}
+    pairs = [pair for pair in pairs if papers_info[pair[0]] is not None and papers_info[pair[1]] is not None]
+    if not pairs:
+        return f"No papers with similarity >= {threshold} found."
+    
+    def describe(pid):
+        return {'paper_id': pid, 'title': papers_info[pid]['title'], 'topics': store.paper_topics(pid)}
+    
+    return json.dumps([
+        {'papers': [describe(first), describe(second)], 'similarity': round(score, 3)}
+        for first, second, score in pairs
+    ], indent=2)
+
 @mcp.resource("papers://folders")
+@metrics.timed
 def get_available_folders() -> str:
     """
     List all available topic folders in the papers directory.
     
-    This resource provides a simple list of all available topic folders.
+    This resource lists every topic with its paper count and last update,
+    most recently updated first, from the store's in-memory catalogue.
     """
-    folders = []
-    
-    # Get all topic directories
-    if os.path.exists(PAPER_DIR):
-        for topic_dir in os.listdir(PAPER_DIR):
-            topic_path = os.path.join(PAPER_DIR, topic_dir)
-            if os.path.isdir(topic_path):
-                papers_file = os.path.join(topic_path, "papers_info.json")
-                if os.path.exists(papers_file):
-                    folders.append(topic_dir)
+    # Get all topics that have stored papers
+    catalogue = store.catalogue()
     
     # Create a simple markdown list
     content = "# Available Topics\n\n"
-    if folders:
-        for folder in folders:
-            content += f"- {folder}\n"
+    if catalogue:
+        for folder, count, updated in catalogue:
+            content += f"- {folder} ({count} papers, updated {datetime.fromtimestamp(updated):%Y-%m-%d %H:%M})\n"
         content += f"\nUse @{folder} to access papers in that topic.\n"
     else:
         content += "No topics found.\n"
     
     return content
 
+@mcp.resource("cache://search")
+@metrics.timed
+def get_search_cache_stats() -> str:
+    """
+    Show the size and hit/miss counters of the arXiv search result cache.
+    """
+    stats = search_cache.stats()
+    
+    content = "# Search Cache\n\n"
+    content += f"- **Entries**: {stats['entries']} / {stats['max_entries']}\n"
+    content += f"- **TTL**: {stats['ttl_seconds']:.0f}s\n"
+    content += f"- **Hits**: {stats['hits']}\n"
+    content += f"- **Misses**: {stats['misses']}\n"
+    content += f"- **Hit rate**: {stats['hit_rate']:.1%}\n"
+    content += f"- **Expired**: {stats['expired']}\n"
+    content += f"- **Evictions**: {stats['evictions']}\n"
+    
+    return content
+
+def component_stats() -> Dict[str, dict]:
+    return {
+        "store": store.stats(),
+        "search_cache": search_cache.stats(),
+        "arxiv": arxiv_scheduler.stats(),
+        "pdf_cache": pdf_cache.stats(),
+    }
+
+@mcp.resource("metrics://server")
+def get_server_metrics() -> str:
+    """
+    Show where the server spends its time: latency percentiles of every
+    tool/resource and of arXiv searches, plus storage, cache and arXiv counters.
+    """
+    snapshot = metrics.snapshot()
+    
+    content = f"# Server Metrics\n\nUptime: {snapshot['uptime_seconds']:.0f}s\n\n"
+    content += "| operation | calls | errors | p50 ms | p95 ms | p99 ms | max ms | total s |\n"
+    content += "|---|---|---|---|---|---|---|---|\n"
+    for operation, stats in snapshot['operations'].items():
+        content += (
+            f"| {operation} | {stats['count']} | {stats['errors']} | {stats['p50'] * 1000:.1f} "
+            f"| {stats['p95'] * 1000:.1f} | {stats['p99'] * 1000:.1f} | {stats['max'] * 1000:.1f} "
+            f"| {stats['total_seconds']:.2f} |\n"
+        )
+    content += "\n"
+    for counter, value in snapshot['counters'].items():
+        content += f"- **{counter}**: {value:g}\n"
+    
+    for component, stats in component_stats().items():
+        content += f"\n## {component}\n"
+        for name, value in stats.items():
+            content += f"- **{name}**: {value:.3g}\n" if isinstance(value, float) else f"- **{name}**: {value}\n"
+    
+    return content
+
+@mcp.resource("metrics://prometheus", mime_type="text/plain")
+def get_prometheus_metrics() -> str:
+    """
+    The same metrics in the Prometheus text exposition format.
+    """
+    return metrics.render_prometheus(component_stats())
+
 @mcp.resource("papers://{topic}")
+@metrics.timed
 def get_topic_papers(topic: str) -> str:
     """
     Get detailed information about papers on a specific topic.
     
+    Papers are returned one page at a time. The URI accepts query parameters:
+    papers://{topic}?page=<cursor>&size=<papers per page>&mode=summary
+    where the cursor of the next page is given at the end of each page and
+    mode=summary lists one line per paper instead of the full details.
+    
     Args:
         topic: The research topic to retrieve papers for
     """
-    topic_dir = topic.lower().replace(" ", "_")
-    papers_file = os.path.join(PAPER_DIR, topic_dir, "papers_info.json")
+    topic, _, query = topic.partition("?")
+    params = parse_qs(query)
+    try:
+        cursor = max(int(params.get("page", ["0"])[0]), 0)
+        size = min(max(int(params.get("size", [str(PAGE_SIZE)])[0]), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return f"# Invalid page parameters for topic: {topic}\n\nUse papers://{topic}?page=<cursor>&size=<n>."
+    summary_mode = params.get("mode", ["full"])[0] == "summary"
     
-    if not os.path.exists(papers_file):
+    if not store.has_topic(topic):
         return f"# No papers found for topic: {topic}\n\nTry searching for papers on this topic first."
     
-    try:
-        with open(papers_file, 'r') as f:
-            papers_data = json.load(f)
-        
-        # Create markdown content with paper details
-        content = f"# Papers on {topic.replace('_', ' ').title()}\n\n"
-        content += f"Total papers: {len(papers_data)}\n\n"
-        
-        for paper_id, paper_info in papers_data.items():
-            content += f"## {paper_info['title']}\n"
-            content += f"- **Paper ID**: {paper_id}\n"
-            content += f"- **Authors**: {', '.join(paper_info['authors'])}\n"
-            content += f"- **Published**: {paper_info['published']}\n"
-            content += f"- **PDF URL**: [{paper_info['pdf_url']}]({paper_info['pdf_url']})\n\n"
-            content += f"### Summary\n{paper_info['summary'][:500]}...\n\n"
-            content += "---\n\n"
-        
-        return content
-    except json.JSONDecodeError:
-        return f"# Error reading papers data for {topic}\n\nThe papers data file is corrupted."
+    total = store.topic_size(topic)
+    papers = list(store.iter_topic(topic, start=cursor, limit=size))
+    if not papers and not total:
+        return f"# No papers found for topic: {topic}\n\nTry searching for papers on this topic first."
+    if not papers:
+        return (f"# Page out of range for topic: {topic}\n\n"
+                f"The topic has {total} papers; page {cursor} is past the end. Start at papers://{topic}?page=0.")
+    
+    # Create markdown content with paper details
+    parts = [
+        f"# Papers on {topic.replace('_', ' ').title()}\n\n",
+        f"Total papers: {total} (showing {min(cursor + 1, total)}-{cursor + len(papers)})\n\n",
+    ]
+    
+    for paper_id, paper_info in papers:
+        if summary_mode:
+            parts.append(f"- **{paper_id}** {paper_info['title']} ({paper_info['published']})\n")
+            continue
+        parts.append(
+            f"## {paper_info['title']}\n"
+            f"- **Paper ID**: {paper_id}\n"
+            f"- **Authors**: {', '.join(paper_info['authors'])}\n"
+            f"- **Published**: {paper_info['published']}\n"
+            f"- **PDF URL**: [{paper_info['pdf_url']}]({paper_info['pdf_url']})\n\n"
+            f"### Summary\n{paper_info['summary'][:500]}...\n\n"
+            "---\n\n"
+        )
+    
+    if cursor + len(papers) < total:
+        next_params = {"page": cursor + len(papers), "size": size}
+        if summary_mode:
+            next_params["mode"] = "summary"
+        parts.append(f"\nNext page: papers://{topic}?{urlencode(next_params)}\n")
+    
+    return "".join(parts)
 
 @mcp.prompt()
 def generate_search_prompt(topic: str, num_papers: int = 5) -> str:
@@ -1,193 +1,139 @@
-import arxiv
-import json
-import os
-from typing import List
-from mcp.server.fastmcp import FastMCP
+"""
+Serve the research tools over SSE.
 
-PAPER_DIR = "papers"
+    uv run sse_server.py               # one process on http://127.0.0.1:8001/sse
+    uv run sse_server.py --workers 4   # four worker processes behind port 8001
 
-# Initialize FastMCP server
-mcp = FastMCP("research", port=8001)
+With --workers N, every worker is a separate server process on port
+8001 + 1..N with its own message path (/w<i>/messages/). A small TCP
+dispatcher on 8001 hands each new /sse connection to the next worker in
+turn and every message POST to the worker that owns its session. The
+workers share papers/ through the stores' file locks, and each gets 1/N of
+the arXiv request budget so that together they still respect it.
+"""
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import re
+import signal
+import sys
+from typing import Callable, List, Optional
 
-@mcp.tool()
-def search_papers(topic: str, max_results: int = 5) -> List[str]:
-    """
-    Search for papers on arXiv based on a topic and store their information.
-    
-    Args:
-        topic: The topic to search for
-        max_results: Maximum number of results to retrieve (default: 5)
-        
-    Returns:
-        List of paper IDs found in the search
-    """
-    
-    # Use arxiv to find the papers 
-    client = arxiv.Client()
-
-    # Search for the most relevant articles matching the queried topic
-    search = arxiv.Search(
-        query = topic,
-        max_results = max_results,
-        sort_by = arxiv.SortCriterion.Relevance
-    )
-
-    papers = client.results(search)
-    
-    # Create directory for this topic
-    path = os.path.join(PAPER_DIR, topic.lower().replace(" ", "_"))
-    os.makedirs(path, exist_ok=True)
-    
-    file_path = os.path.join(path, "papers_info.json")
-
-    # Try to load existing papers info
+PORT = 8001
+
+_WORKER_PATH = re.compile(rb"^[A-Z]+ /w(\d+)/")
+
+
+def run_worker(port: int, message_path: str = "/messages/", workers: int = 1,
+               setup: Optional[Callable[[], None]] = None):
+    """Run one SSE server process (worker process entry point)."""
+    # Imported here so the dispatcher process never opens the stores
+    from server import arxiv_scheduler, mcp
+    if setup is not None:
+        setup()
+    mcp.settings.port = port
+    mcp.settings.message_path = message_path
+    arxiv_scheduler.bucket.rate /= workers
+    mcp.run(transport='sse')
+
+
+def _close_after(head: bytes) -> bytes:
+    """Ask the worker to close the connection after this request, so the next one is routed again."""
+    lines = [line for line in head.split(b"\r\n") if not line.lower().startswith(b"connection:")]
+    return b"\r\n".join(lines[:1] + [b"Connection: close"] + lines[1:])
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
     try:
-        with open(file_path, "r") as json_file:
-            papers_info = json.load(json_file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        papers_info = {}
-
-    # Process each paper and add to papers_info  
-    paper_ids = []
-    for paper in papers:
-        paper_ids.append(paper.get_short_id())
-        paper_info = {
-            'title': paper.title,
-            'authors': [author.name for author in paper.authors],
-            'summary': paper.summary,
-            'pdf_url': paper.pdf_url,
-            'published': str(paper.published.date())
-        }
-        papers_info[paper.get_short_id()] = paper_info
-    
-    # Save updated papers_info to json file
-    with open(file_path, "w") as json_file:
-        json.dump(papers_info, json_file, indent=2)
-    
-    print(f"Results are saved in: {file_path}")
-    
-    return paper_ids
-
-@mcp.tool()
-def extract_info(paper_id: str) -> str:
-    """
-    Search for information about a specific paper across all topic directories.
-    
-    Args:
-        paper_id: The ID of the paper to look for
-        
-    Returns:
-        JSON string with paper information if found, error message if not found
-    """
- 
-    for item in os.listdir(PAPER_DIR):
-        item_path = os.path.join(PAPER_DIR, item)
-        if os.path.isdir(item_path):
-            file_path = os.path.join(item_path, "papers_info.json")
-            if os.path.isfile(file_path):
-                try:
-                    with open(file_path, "r") as json_file:
-                        papers_info = json.load(json_file)
-                        if paper_id in papers_info:
-                            return json.dumps(papers_info[paper_id], indent=2)
-                except (FileNotFoundError, json.JSONDecodeError) as e:
-                    print(f"Error reading {file_path}: {str(e)}")
-                    continue
-    
-    return f"There's no saved information related to paper {paper_id}."
-
-
-
-@mcp.resource("papers://folders")
-def get_available_folders() -> str:
-    """
-    List all available topic folders in the papers directory.
-    
-    This resource provides a simple list of all available topic folders.
-    """
-    folders = []
-    
-    # Get all topic directories
-    if os.path.exists(PAPER_DIR):
-        for topic_dir in os.listdir(PAPER_DIR):
-            topic_path = os.path.join(PAPER_DIR, topic_dir)
-            if os.path.isdir(topic_path):
-                papers_file = os.path.join(topic_path, "papers_info.json")
-                if os.path.exists(papers_file):
-                    folders.append(topic_dir)
-    
-    # Create a simple markdown list
-    content = "# Available Topics\n\n"
-    if folders:
-        for folder in folders:
-            content += f"- {folder}\n"
-        content += f"\nUse @{folder} to access papers in that topic.\n"
-    else:
-        content += "No topics found.\n"
-    
-    return content
-
-@mcp.resource("papers://{topic}")
-def get_topic_papers(topic: str) -> str:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+class Dispatcher:
+    def __init__(self, ports: List[int]):
+        self.ports = ports
+        self._next = itertools.cycle(range(len(ports)))
+
+    async def handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+
+        # Message POSTs name their worker; new SSE streams go round-robin
+        match = _WORKER_PATH.match(head)
+        if match and int(match.group(1)) < len(self.ports):
+            worker = int(match.group(1))
+        else:
+            worker = next(self._next)
+
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", self.ports[worker])
+        except OSError:
+            client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await client_writer.drain()
+            client_writer.close()
+            return
+        upstream_writer.write(_close_after(head))
+        await asyncio.gather(_pipe(client_reader, upstream_writer), _pipe(upstream_reader, client_writer))
+
+
+async def dispatch(port: int, worker_ports: List[int]):
+    dispatcher = Dispatcher(worker_ports)
+    listener = await asyncio.start_server(dispatcher.handle, "127.0.0.1", port)
+    async with listener:
+        await listener.serve_forever()
+
+
+def serve(port: int = PORT, workers: int = 1, setup: Optional[Callable[[], None]] = None):
     """
-    Get detailed information about papers on a specific topic.
-    
+    Serve on port, in this process or spread over worker processes.
+
     Args:
-        topic: The research topic to retrieve papers for
+        port: Port clients connect to
+        workers: Number of server processes (default: 1, no dispatcher)
+        setup: Picklable function each worker calls after importing the server
     """
-    topic_dir = topic.lower().replace(" ", "_")
-    papers_file = os.path.join(PAPER_DIR, topic_dir, "papers_info.json")
-    
-    if not os.path.exists(papers_file):
-        return f"# No papers found for topic: {topic}\n\nTry searching for papers on this topic first."
-    
+    if workers <= 1:
+        run_worker(port, setup=setup)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    worker_ports = [port + 1 + index for index in range(workers)]
+    processes = [
+        context.Process(target=run_worker, args=(worker_port, f"/w{index}/messages/", workers, setup), daemon=True)
+        for index, worker_port in enumerate(worker_ports)
+    ]
+    for process in processes:
+        process.start()
+    # Stop the workers too when the dispatcher is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Dispatching http://127.0.0.1:{port}/sse to {workers} workers on ports "
+          f"{worker_ports[0]}-{worker_ports[-1]}")
     try:
-        with open(papers_file, 'r') as f:
-            papers_data = json.load(f)
-        
-        # Create markdown content with paper details
-        content = f"# Papers on {topic.replace('_', ' ').title()}\n\n"
-        content += f"Total papers: {len(papers_data)}\n\n"
-        
-        for paper_id, paper_info in papers_data.items():
-            content += f"## {paper_info['title']}\n"
-            content += f"- **Paper ID**: {paper_id}\n"
-            content += f"- **Authors**: {', '.join(paper_info['authors'])}\n"
-            content += f"- **Published**: {paper_info['published']}\n"
-            content += f"- **PDF URL**: [{paper_info['pdf_url']}]({paper_info['pdf_url']})\n\n"
-            content += f"### Summary\n{paper_info['summary'][:500]}...\n\n"
-            content += "---\n\n"
-        
-        return content
-    except json.JSONDecodeError:
-        return f"# Error reading papers data for {topic}\n\nThe papers data file is corrupted."
-
-@mcp.prompt()
-def generate_search_prompt(topic: str, num_papers: int = 5) -> str:
-    """Generate a prompt for Claude to find and discuss academic papers on a specific topic."""
-    return f"""Search for {num_papers} academic papers about '{topic}' using the search_papers tool. 
-
-    Follow these instructions:
-    1. First, search for papers using search_papers(topic='{topic}', max_results={num_papers})
-    2. For each paper found, extract and organize the following information:
-       - Paper title
-       - Authors
-       - Publication date
-       - Brief summary of the key findings
-       - Main contributions or innovations
-       - Methodologies used
-       - Relevance to the topic '{topic}'
-    
-    3. Provide a comprehensive summary that includes:
-       - Overview of the current state of research in '{topic}'
-       - Common themes and trends across the papers
-       - Key research gaps or areas for future investigation
-       - Most impactful or influential papers in this area
-    
-    4. Organize your findings in a clear, structured format with headings and bullet points for easy readability.
-    
-    Please present both detailed information about each paper and a high-level synthesis of the research landscape in {topic}."""
+        asyncio.run(dispatch(port, worker_ports))
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
 
 if __name__ == "__main__":
-    # Initialize and run the server
-    mcp.run(transport='sse')
+    parser = argparse.ArgumentParser(description="Serve the research tools over SSE")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=1, help="server processes sharing papers/")
+    args = parser.parse_args()
+    serve(args.port, args.workers)
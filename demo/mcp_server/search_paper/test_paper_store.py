@@ -0,0 +1,92 @@
+"""
+Tests of PaperStore under concurrent writers and readers.
+
+    uv run python -m unittest test_paper_store
+"""
+import multiprocessing
+import shutil
+import tempfile
+import traceback
+import unittest
+
+import paper_store
+from paper_store import PaperStore
+
+TOPICS = ["rl", "nlp"]
+ROUNDS = 150
+
+
+def _check(paper_id: str, paper_info: dict):
+    if paper_info.get("paper") != paper_id:
+        raise AssertionError(f"Read {paper_info} for paper {paper_id}")
+
+
+def _write(root: str, worker: int):
+    """Rewrite the same papers over and over so the logs keep being compacted."""
+    paper_store.COMPACT_MIN_DEAD = 4
+    store = PaperStore(root)
+    for version in range(ROUNDS):
+        for topic in TOPICS:
+            paper_ids = [f"{topic}-{worker}-{index}" for index in range(4)]
+            store.add_papers(topic, {
+                paper_id: {"paper": paper_id, "version": version} for paper_id in paper_ids
+            })
+
+
+def _read(root: str, worker: int):
+    """Read through an index that other processes' compactions make stale."""
+    store = PaperStore(root)
+    for version in range(ROUNDS):
+        if version % 10 == 0:
+            store.refresh()
+        for topic in TOPICS:
+            for paper_id, paper_info in store.iter_topic(topic):
+                _check(paper_id, paper_info)
+        for paper_id, paper_info in store.iter_papers():
+            _check(paper_id, paper_info)
+        for paper_id in store.paper_ids()[:4]:
+            paper_info = store.get(paper_id)
+            if paper_info is not None:
+                _check(paper_id, paper_info)
+
+
+def _run(target, root: str, worker: int, failures):
+    try:
+        target(root, worker)
+    except Exception:
+        failures.put(traceback.format_exc())
+
+
+class ConcurrentAccessTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_readers_survive_compactions_by_other_processes(self):
+        # Start with every paper stored so the readers have something to index
+        for worker in range(2):
+            PaperStore(self.root).add_papers(TOPICS[0], {f"seed-{worker}": {"paper": f"seed-{worker}"}})
+        failures = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_run, args=(target, self.root, worker, failures))
+            for worker, target in enumerate([_write, _write, _read, _read])
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        errors = []
+        while not failures.empty():
+            errors.append(failures.get())
+        self.assertEqual(errors, [], "\n".join(errors))
+        self.assertEqual([process.exitcode for process in processes], [0] * len(processes))
+
+        store = PaperStore(self.root)
+        for paper_id, paper_info in store.iter_papers():
+            _check(paper_id, paper_info)
+        self.assertEqual(store.topic_size("rl"), 2 + 2 * 4)
+        self.assertEqual(store.topic_size("nlp"), 2 * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
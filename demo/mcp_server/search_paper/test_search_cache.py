@@ -0,0 +1,44 @@
+"""
+Tests of the persisted arXiv search cache.
+
+    uv run python -m unittest test_search_cache
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from search_cache import SearchCache
+
+
+class SearchCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = os.path.join(self.root, "search_cache.json")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = SearchCache(self.path, max_entries=2)
+        cache.put("a", 5, ["1"])
+        cache.put("b", 5, ["2"])
+        self.assertEqual(cache.get("a", 5), ["1"])
+        cache.put("c", 5, ["3"])
+        self.assertEqual(list(cache._entries), ["a|5", "c|5"])
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(list(SearchCache(self.path, max_entries=2)._entries), ["a|5", "c|5"])
+
+    def test_entries_of_other_processes_are_kept_and_evicted_first(self):
+        first = SearchCache(self.path, max_entries=3)
+        second = SearchCache(self.path, max_entries=3)
+        first.put("a", 5, ["1"])
+        second.put("b", 5, ["2"])
+        second.put("c", 5, ["3"])
+        # b and c come from the file, older than everything first used
+        first.put("d", 5, ["4"])
+        self.assertEqual(list(first._entries), ["c|5", "a|5", "d|5"])
+        self.assertEqual(first.stats()["evictions"], 0)
+        self.assertEqual(first.get("c", 5), ["3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
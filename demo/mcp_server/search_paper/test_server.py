@@ -0,0 +1,75 @@
+"""
+Tests of the research server's local search tools.
+
+    uv run python -m unittest test_server
+"""
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PAPERS = {
+    "rl": {
+        "r1": {"title": "Policy gradient methods for reinforcement learning", "authors": ["A"], "summary": "policy gradient reward"},
+        "r2": {"title": "Policy gradient methods for reinforcement learning agents", "authors": ["A"], "summary": "policy gradient reward"},
+        "both": {"title": "Transformers for reinforcement learning", "authors": ["C"], "summary": "attention reward"},
+    },
+    "nlp": {
+        "n1": {"title": "Attention is what language models need", "authors": ["B"], "summary": "attention language"},
+        "both": {"title": "Transformers for reinforcement learning", "authors": ["C"], "summary": "attention reward"},
+    },
+}
+
+
+class DeletedTopicTest(unittest.TestCase):
+    def setUp(self):
+        # server.py keeps its papers in ./papers
+        self.cwd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        os.chdir(self.root)
+        self.addCleanup(shutil.rmtree, self.root)
+        self.addCleanup(os.chdir, self.cwd)
+        sys.path.insert(0, HERE)
+        self.addCleanup(sys.path.remove, HERE)
+        self.server = importlib.reload(sys.modules["server"]) if "server" in sys.modules else importlib.import_module("server")
+        for topic, papers_info in PAPERS.items():
+            self.server.store.add_papers(topic, papers_info)
+            self.server.index_papers(papers_info)
+
+    def found_ids(self) -> set:
+        server = self.server
+        results = json.loads(server.search_local_papers("reinforcement learning policy attention"))
+        results += json.loads(server.semantic_search_papers("policy gradient reinforcement learning"))
+        paper_ids = {result["paper_id"] for result in results}
+        duplicates = server.find_duplicate_papers(threshold=0.5)
+        if duplicates.startswith("["):
+            paper_ids |= {paper["paper_id"] for pair in json.loads(duplicates) for paper in pair["papers"]}
+        return paper_ids
+
+    def test_papers_of_deleted_topics_are_not_returned(self):
+        self.assertIn("r1", self.found_ids())
+        shutil.rmtree(os.path.join("papers", "rl"))
+
+        paper_ids = self.found_ids()
+        self.assertNotIn("r1", paper_ids)
+        self.assertNotIn("r2", paper_ids)
+        # Still stored under the other topic
+        self.assertIn("both", paper_ids)
+        self.assertNotIn("r1", self.server.text_index._docs)
+        self.assertNotIn("r1", self.server.vector_index)
+        self.assertEqual(self.server.extract_info("r1"), "There's no saved information related to paper r1.")
+
+    def test_vectors_of_deleted_topics_are_dropped_at_startup(self):
+        shutil.rmtree(os.path.join("papers", "rl"))
+        self.server = importlib.reload(self.server)
+        self.assertNotIn("r1", self.server.vector_index)
+        self.assertNotIn("r1", self.found_ids())
+
+
+if __name__ == "__main__":
+    unittest.main()
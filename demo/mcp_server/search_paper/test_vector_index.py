@@ -0,0 +1,69 @@
+"""
+Tests of the memory-mapped vector index.
+
+    uv run python -m unittest test_vector_index
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import vector_index
+from paper_store import PaperStore
+from vector_index import VectorIndex
+
+
+SUBJECTS = {"p0": "graph neural networks", "p1": "diffusion models", "p2": "protein folding", "p3": "quantum error correction"}
+
+
+def paper(paper_id: str, version: int = 0) -> dict:
+    return {"title": f"Advances in {SUBJECTS.get(paper_id, paper_id)}", "summary": f"revision {version}"}
+
+
+class VectorIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.directory = os.path.join(self.root, "vectors")
+
+    def test_unchanged_records_are_not_embedded_again(self):
+        store = PaperStore(os.path.join(self.root, "papers"))
+        papers_info = {f"p{index}": paper(f"p{index}") for index in range(5)}
+        store.add_papers("topic", papers_info)
+        index = VectorIndex(self.directory)
+        self.assertEqual(index.add_papers(papers_info.items()), 5)
+
+        reopened = VectorIndex(self.directory)
+        # What the server checks at startup before reading any record
+        for paper_id in store.paper_ids():
+            self.assertEqual(reopened.embedded_crc(paper_id), store.stored_crc(paper_id))
+        with mock.patch.object(vector_index, "embed") as embed:
+            self.assertEqual(reopened.add_papers(papers_info.items()), 0)
+        embed.assert_not_called()
+        self.assertEqual(reopened.add_papers([("p0", paper("p0", 1))]), 1)
+
+    @mock.patch.object(vector_index, "COMPACT_MIN_DEAD", 4)
+    def test_superseded_and_removed_rows_are_compacted(self):
+        index = VectorIndex(self.directory)
+        other = VectorIndex(self.directory)
+        index.add_papers((paper_id, paper(paper_id)) for paper_id in SUBJECTS)
+        self.assertEqual(other.search("quantum error correction", 1)[0][0], "p3")
+        for version in range(1, 10):
+            index.add_papers((paper_id, paper(paper_id, version)) for paper_id in SUBJECTS)
+        self.assertGreater(index.compactions, 0)
+        self.assertLessEqual(os.path.getsize(os.path.join(self.directory, "vectors.f32")), 8 * 4 * vector_index.DIM)
+
+        # Another process reloads after the compaction instead of using stale rows
+        self.assertEqual(other.search("quantum error correction", 1)[0][0], "p3")
+        self.assertEqual(other.embedded_crc("p3"), index.embedded_crc("p3"))
+
+        index.remove_papers(["p0", "p1"])
+        index.add_papers([("p2", paper("p2", 20)), ("p3", paper("p3", 20))])
+        reopened = VectorIndex(self.directory)
+        self.assertEqual(sorted(reopened.paper_ids()), ["p2", "p3"])
+        self.assertEqual(reopened.search("protein folding", 1)[0][0], "p2")
+
+
+if __name__ == "__main__":
+    unittest.main()
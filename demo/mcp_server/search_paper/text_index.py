@@ -0,0 +1,104 @@
+"""
+In-memory BM25 index over the stored papers.
+
+Every paper is indexed by the words of its title (counted twice, so title
+matches rank higher), authors and summary. The index is built once from
+the paper store at startup and then updated incrementally as
+search_papers stores new papers (and papers whose topics are deleted are
+dropped), so keyword queries over the local corpus never touch disk or
+arXiv.
+"""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the "
+    "this to was we were which with".split()
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def paper_terms(paper_info: dict) -> Counter:
+    """Term frequencies of a paper's title (weighted x2), authors and summary."""
+    title = tokenize(paper_info.get("title", ""))
+    terms = Counter(title + title)
+    terms.update(tokenize(" ".join(paper_info.get("authors", []))))
+    terms.update(tokenize(paper_info.get("summary", "")))
+    return terms
+
+
+class TextIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        # term -> {paper id: term frequency}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # paper id -> (document length, title, indexed terms)
+        self._docs: Dict[str, Tuple[int, str, Tuple[str, ...]]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add_papers(self, papers: Iterable[Tuple[str, dict]]):
+        """Index (paper id, paper information) pairs, replacing earlier versions."""
+        with self._lock:
+            for paper_id, paper_info in papers:
+                self._remove(paper_id)
+                terms = paper_terms(paper_info)
+                for term, count in terms.items():
+                    self._postings.setdefault(term, {})[paper_id] = count
+                length = sum(terms.values())
+                self._docs[paper_id] = (length, paper_info.get("title", ""), tuple(terms))
+                self._total_length += length
+
+    def remove_papers(self, paper_ids: Iterable[str]):
+        """Drop papers from the index."""
+        with self._lock:
+            for paper_id in paper_ids:
+                self._remove(paper_id)
+
+    def _remove(self, paper_id: str):
+        doc = self._docs.pop(paper_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc[0]
+        for term in doc[2]:
+            postings = self._postings[term]
+            del postings[paper_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, max_results: int = 10) -> List[Tuple[str, str, float]]:
+        """
+        Rank stored papers against a keyword query with BM25.
+
+        Returns:
+            (paper id, title, score) tuples, best match first
+        """
+        with self._lock:
+            if not self._docs:
+                return []
+            n_docs = len(self._docs)
+            avg_length = self._total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for paper_id, tf in postings.items():
+                    length = self._docs[paper_id][0]
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[paper_id] = scores.get(paper_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:max_results]
+            return [(paper_id, self._docs[paper_id][1], score) for paper_id, score in ranked]
@@ -0,0 +1,338 @@
+"""
+CPU-only vector index over the stored papers.
+
+Papers are embedded with feature hashing: every word and word bigram of
+the title (weighted x2), authors and summary is hashed into one of DIM
+signed buckets and the vector is L2-normalized, so similar texts get a
+high cosine similarity without any model download.
+
+Vectors are appended as float32 rows to papers/vectors/vectors.f32 and
+the matching paper ids, with the crc of the stored record each row was
+embedded from, to papers/vectors/ids.txt. The matrix file is
+memory-mapped for queries, so the index costs no Python objects per
+paper beyond its id. Papers whose record crc matches their latest row are
+not embedded again (nor, at server startup, read from the store); a paper
+whose record changes gets a new row and the id always points at its
+latest row. Once there are as many superseded and removed rows as live
+ones, the files are compacted.
+
+Several server processes can share the directory: appends and
+compactions hold papers/vectors/vectors.lock, and each process picks up
+the rows the others appended (ids.txt grows last) before answering a
+query. Every compaction grows the lock file by a byte, so the other
+processes reload the files rather than trust their row numbers.
+"""
+import array
+import heapq
+import math
+import mmap
+import os
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from paper_store import locked_file, record_crc
+from text_index import tokenize
+
+DIM = 256
+# Compact the files once they hold at least this many superseded (or
+# removed) rows and those are at least as many as the live ones
+COMPACT_MIN_DEAD = 256
+# Near-duplicate candidates must agree on the signs of one whole band
+BAND_SIZE = 16
+
+
+def _features(text: str) -> List[str]:
+    words = tokenize(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def embed(paper_info: dict, dim: int = DIM) -> List[float]:
+    """Hash a paper (or a {'title': query} dict) into a unit-length vector."""
+    counts: Dict[str, float] = {}
+    for weight, text in (
+        (2.0, paper_info.get("title", "")),
+        (1.0, " ".join(paper_info.get("authors", []))),
+        (1.0, paper_info.get("summary", "")),
+    ):
+        for feature in _features(text):
+            counts[feature] = counts.get(feature, 0.0) + weight
+
+    vector = [0.0] * dim
+    for feature, count in counts.items():
+        h = zlib.crc32(feature.encode())
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vector[h % dim] += sign * (1.0 + math.log(count))
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+
+class VectorIndex:
+    def __init__(self, directory: str, dim: int = DIM):
+        self.dim = dim
+        self._matrix_path = os.path.join(directory, "vectors.f32")
+        self._ids_path = os.path.join(directory, "ids.txt")
+        self._lock_path = os.path.join(directory, "vectors.lock")
+        self._lock = threading.Lock()
+        # row -> paper id and crc of the record it was embedded from, and
+        # paper id -> its latest row
+        self._ids: List[str] = []
+        self._crcs: List[Optional[int]] = []
+        self._rows: Dict[str, int] = {}
+        self._mmap: Optional[mmap.mmap] = None
+        self._matrix: Optional[memoryview] = None
+        # Bytes of ids.txt already read into self._ids
+        self._ids_size = 0
+        # Size of vectors.lock when the files were loaded; compactions grow it
+        self._generation = 0
+        self.compactions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        with locked_file(self._lock_path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, paper_id: str) -> bool:
+        return paper_id in self._rows
+
+    def paper_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rows)
+
+    def embedded_crc(self, paper_id: str) -> Optional[int]:
+        """Crc of the record a paper's vector was embedded from (see paper_store.record_crc)."""
+        with self._lock:
+            row = self._rows.get(paper_id)
+            return None if row is None else self._crcs[row]
+
+    def remove_papers(self, paper_ids: Iterable[str]):
+        """Stop returning papers from queries; their rows are dropped at the next compaction."""
+        paper_ids = list(paper_ids)
+        with self._lock:
+            for paper_id in paper_ids:
+                self._rows.pop(paper_id, None)
+            if self._should_compact():
+                with locked_file(self._lock_path) as lock_file:
+                    self._catch_up(locked=True)
+                    # Catching up may have reloaded them
+                    for paper_id in paper_ids:
+                        self._rows.pop(paper_id, None)
+                    self._compact(lock_file)
+
+    def _parse(self, data: bytes):
+        """Append the rows of complete `paper id crc` lines of ids.txt."""
+        for line in data.decode().splitlines():
+            paper_id, _, crc = line.partition(" ")
+            self._rows[paper_id] = len(self._ids)
+            self._ids.append(paper_id)
+            # Indexes written before crcs were recorded have none
+            self._crcs.append(int(crc) if crc else None)
+
+    def _load(self):
+        """Read ids.txt and map the matrix from scratch (caller holds the file lock)."""
+        self._ids, self._crcs, self._rows = [], [], {}
+        self._generation = os.path.getsize(self._lock_path)
+        data = b""
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, "rb") as ids_file:
+                data = ids_file.read()
+        self._parse(data)
+        self._ids_size = len(data)
+        row_bytes = 4 * self.dim
+        matrix_rows = os.path.getsize(self._matrix_path) // row_bytes if os.path.exists(self._matrix_path) else 0
+        rows = len(self._ids)
+        if rows > matrix_rows:
+            # Rows are written before their ids, so only a compaction that
+            # was interrupted between its two renames gets here; start over
+            print(f"Vector index in {os.path.dirname(self._matrix_path)} is inconsistent; rebuilding it")
+            rows = 0
+        if rows != len(self._ids) or rows != matrix_rows:
+            # Drop a row that was only half written by a crash
+            data = "".join(
+                f"{paper_id} {crc}\n" if crc is not None else f"{paper_id}\n"
+                for paper_id, crc in zip(self._ids[:rows], self._crcs[:rows])
+            ).encode()
+            self._ids, self._crcs, self._rows = [], [], {}
+            self._parse(data)
+            with open(self._ids_path, "wb") as ids_file:
+                ids_file.write(data)
+            self._ids_size = len(data)
+            with open(self._matrix_path, "ab") as matrix_file:
+                matrix_file.truncate(rows * row_bytes)
+        self._remap()
+
+    def _remap(self):
+        if self._matrix is not None:
+            self._matrix.release()
+            self._mmap.close()
+            self._matrix = self._mmap = None
+        if self._ids:
+            with open(self._matrix_path, "rb") as matrix_file:
+                self._mmap = mmap.mmap(matrix_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._matrix = memoryview(self._mmap).cast("f")
+
+    def _row(self, row: int) -> memoryview:
+        return self._matrix[row * self.dim:(row + 1) * self.dim]
+
+    def _reload(self, locked: bool):
+        if locked:
+            self._load()
+        else:
+            with locked_file(self._lock_path):
+                self._load()
+
+    def _catch_up(self, locked: bool = False):
+        """
+        Map the rows other processes appended, or reload after their compaction.
+
+        Args:
+            locked: Whether the caller already holds the file lock
+        """
+        if os.path.getsize(self._lock_path) != self._generation:
+            self._reload(locked)
+            return
+        try:
+            size = os.path.getsize(self._ids_path)
+        except FileNotFoundError:
+            return
+        if size <= self._ids_size:
+            return
+        with open(self._ids_path, "rb") as ids_file:
+            ids_file.seek(self._ids_size)
+            data = ids_file.read(size - self._ids_size)
+        # Ids are written after their rows, so every complete line has one
+        data = data[:data.rfind(b"\n") + 1]
+        if not data:
+            return
+        self._parse(data)
+        self._ids_size += len(data)
+        self._remap()
+        if os.path.getsize(self._lock_path) != self._generation:
+            # Compacted while we read; the offsets above were stale
+            self._reload(locked)
+
+    def add_papers(self, papers: Iterable[Tuple[str, dict]]) -> int:
+        """
+        Embed and append papers that are new or whose stored record changed.
+
+        Returns:
+            Number of rows appended
+        """
+        papers = list(papers)
+        with self._lock, locked_file(self._lock_path) as lock_file:
+            self._catch_up(locked=True)
+            new_rows = []
+            for paper_id, paper_info in papers:
+                crc = record_crc(paper_id, paper_info)
+                row = self._rows.get(paper_id)
+                if row is not None and self._crcs[row] == crc:
+                    continue
+                new_rows.append((paper_id, crc, embed(paper_info, self.dim)))
+            if not new_rows:
+                return 0
+
+            # Matrix first, ids last: a crash in between leaves an extra
+            # matrix row that is dropped on the next start
+            with open(self._matrix_path, "ab") as matrix_file:
+                for _, _, vector in new_rows:
+                    matrix_file.write(array.array("f", vector).tobytes())
+            ids_data = "".join(f"{paper_id} {crc}\n" for paper_id, crc, _ in new_rows).encode()
+            with open(self._ids_path, "ab") as ids_file:
+                ids_file.write(ids_data)
+            self._parse(ids_data)
+            self._ids_size += len(ids_data)
+            self._remap()
+            if self._should_compact():
+                self._compact(lock_file)
+            return len(new_rows)
+
+    def _should_compact(self) -> bool:
+        dead = len(self._ids) - len(self._rows)
+        return dead >= COMPACT_MIN_DEAD and dead >= len(self._rows)
+
+    def _compact(self, lock_file):
+        """Rewrite the files with only the latest row of each paper (caller holds both locks)."""
+        live = sorted(self._rows.items(), key=lambda item: item[1])
+        with open(self._matrix_path + ".tmp", "wb") as matrix_file:
+            for _, row in live:
+                matrix_file.write(self._row(row).tobytes())
+            os.fsync(matrix_file.fileno())
+        with open(self._ids_path + ".tmp", "wb") as ids_file:
+            ids_file.write("".join(
+                f"{paper_id} {self._crcs[row]}\n" if self._crcs[row] is not None else f"{paper_id}\n"
+                for paper_id, row in live
+            ).encode())
+            os.fsync(ids_file.fileno())
+        # Matrix first, as for appends: a crash in between leaves more ids
+        # than rows, which the next start detects
+        os.replace(self._matrix_path + ".tmp", self._matrix_path)
+        os.replace(self._ids_path + ".tmp", self._ids_path)
+        # Bump the generation so other processes reload instead of trusting row numbers
+        lock_file.write(b".")
+        lock_file.flush()
+        self.compactions += 1
+        self._load()
+
+    def _nearest(self, query: Dict[int, float], k: int, exclude: str = "") -> List[Tuple[str, float]]:
+        # The query is sparse, so only its non-zero dimensions are read
+        matrix, dim = self._matrix, self.dim
+        scored = (
+            (paper_id, sum(value * matrix[row * dim + d] for d, value in query.items()))
+            for paper_id, row in self._rows.items()
+            if paper_id != exclude
+        )
+        return heapq.nlargest(k, scored, key=lambda item: item[1])
+
+    def search(self, text: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return (paper id, cosine similarity) of the k papers closest to a text."""
+        query = {d: v for d, v in enumerate(embed({"title": text}, self.dim)) if v}
+        with self._lock:
+            self._catch_up()
+            if not query or not self._rows:
+                return []
+            return self._nearest(query, k)
+
+    def similar(self, paper_id: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return (paper id, cosine similarity) of the k papers closest to a stored paper."""
+        with self._lock:
+            self._catch_up()
+            row = self._rows.get(paper_id)
+            if row is None:
+                return []
+            query = {d: v for d, v in enumerate(self._row(row)) if v}
+            return self._nearest(query, k, exclude=paper_id)
+
+    def near_duplicates(self, threshold: float = 0.9) -> List[Tuple[str, str, float]]:
+        """
+        Find pairs of papers whose cosine similarity is at least `threshold`.
+
+        Candidates are papers whose vectors have identical signs over at
+        least one band of BAND_SIZE dimensions (locality-sensitive hashing),
+        so near-identical papers are found without comparing every pair.
+
+        Returns:
+            (paper id, paper id, similarity) tuples, most similar first
+        """
+        with self._lock:
+            self._catch_up()
+            buckets: Dict[Tuple[int, bytes], List[str]] = {}
+            for paper_id, row in self._rows.items():
+                vector = self._row(row)
+                for band in range(0, self.dim, BAND_SIZE):
+                    signs = bytes(vector[d] > 0 for d in range(band, band + BAND_SIZE))
+                    buckets.setdefault((band, signs), []).append(paper_id)
+
+            pairs: Dict[Tuple[str, str], float] = {}
+            for members in buckets.values():
+                for i, first in enumerate(members):
+                    for second in members[i + 1:]:
+                        key = (first, second) if first < second else (second, first)
+                        if key in pairs:
+                            continue
+                        pairs[key] = sum(
+                            a * b for a, b in zip(self._row(self._rows[first]), self._row(self._rows[second]))
+                        )
+        duplicates = [(a, b, score) for (a, b), score in pairs.items() if score >= threshold]
+        return sorted(duplicates, key=lambda item: item[2], reverse=True)